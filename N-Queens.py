@@ -1,19 +1,206 @@
-from ga import *
-import cython
-from chess import *
-from performance_functions import performance_evaluation
+import argparse
+import json
+import os
+import sys
+from constants import *
+from config import GAConfig
 
+"""
+Command line entry point.
 
-def main():
-    genetic_algorithm()
-    # performance_evaluation(100)
-    # state = [[0, 7], [1, 0], [2, 6], [3, 3], [4, 1], [5, 4], [6, 2], [7, 5]]
-    # print(state)
-    # print(count_safe_pieces(state, TABLE_SIZE, PIECE))
-    # print_board(state)
-    # state = remove_attacking_pieces(state, TABLE_SIZE, PIECE)
-    # print_board(state)
+    solve      runs the GA, every GAConfig value has a flag, unset flags keep the constants.py value
+    enumerate  restarts the GA to collect distinct solutions, see solutions.py
+    bench      runs the performance sweeps, the kernel benchmark or the import time budget check
+    render     writes (or shows) the board of a state given as JSON
+
+Only argparse, constants and config are imported at start up, the GA, pygame and matplotlib
+are loaded by the subcommand that needs them. Without a subcommand it solves with the defaults.
+"""
+
+# GAConfig flags of the solve subcommand: name, type, help
+CONFIG_ARGS = [
+    ('table_size', int, 'board side'),
+    ('piece', str, 'one of ' + ', '.join([QUEEN, BISHOP, ROOK, KNIGHT])),
+    ('pop_size', int, 'population size'),
+    ('init_size', int, 'size of the first population'),
+    ('num_parents', int, 'parents kept every generation'),
+    ('num_generations', int, 'most generations to run'),
+    ('mutate_chance', float, 'mutation probability'),
+    ('selection', str, 'best, tournament or roulette'),
+    ('tournament_size', int, 'individuals per tournament'),
+    ('crossover', str, 'one_point, order or pmx'),
+    ('mutation', str, 'reset or swap'),
+    ('seed', int, 'seed for a reproducible run'),
+    ('strategy', str, 'analytic, seeded or ga'),
+    ('memetic_steps', int, 'min conflicts moves per parent and generation'),
+    ('stall_limit', int, 'stop after this many generations without improvement'),
+    ('time_budget', float, 'stop after this many seconds'),
+    ('cache_size', int, 'states kept in the fitness cache, 0 turns it off'),
+    ('reporter', str, 'silent, print or jsonl'),
+    ('report_every', int, 'report every n-th generation'),
+    ('report_interval', float, 'at most one report per this many seconds'),
+    ('report_path', str, 'file the jsonl reporter writes to'),
+    ('checkpoint_path', str, '.npz checkpoint of the run'),
+    ('checkpoint_every', int, 'generations between checkpoints'),
+    ('trace_path', str, 'per generation trace, .jsonl or .trace, + .gz to compress'),
+]
+# GAConfig switches, flag name and GAConfig value it sets
+CONFIG_SWITCHES = [('incremental', 'incremental', True), ('adaptive', 'adaptive', True), ('quiet', 'verbose', False),
+                   ('resume', 'resume', True)]
+
+
+def config_from_args(args):
+    values = {name: getattr(args, name) for name, _, _ in CONFIG_ARGS if getattr(args, name) is not None}
+    for flag, name, value in CONFIG_SWITCHES:
+        if getattr(args, flag):
+            values[name] = value
+    return GAConfig(**values)
+
+
+def solve_command(args):
+    from ga import genetic_algorithm, solve
+    config = config_from_args(args)
+    if args.json and config.report_path is None:
+        # stdout only carries the result
+        config = config.replace(verbose=False)
+    evaluator = None
+    if args.evaluator != 'serial':
+        from evaluators import get_evaluator
+        evaluator = get_evaluator(args.evaluator, args.workers)
+
+    hooks = []
+    if args.profile is not None:
+        from profiling import TraceRecorder
+        hooks.append(TraceRecorder())
+    try:
+        if args.json:
+            result = solve(config, evaluator, hooks)
+            print(json.dumps(result.to_dict()))
+        else:
+            genetic_algorithm(config, evaluator, hooks, None if args.no_image else args.image, args.show)
+    finally:
+        if evaluator is not None:
+            evaluator.close()
+    if hooks:
+        # with --json stdout only carries the result
+        hooks[0].print_summary(sys.stderr if args.json else None)
+        hooks[0].write(args.profile)
+
+
+def enumerate_command(args):
+    from solutions import enumerate_solutions
+    summary = enumerate_solutions(config_from_args(args), args.max_solutions, args.max_runs, args.time_budget_total,
+                                  args.out, args.seed, not args.quiet)
+    summary.pop('solutions')
+    print(json.dumps(summary))
+
+
+def bench_command(args, parser):
+    import performance_functions
+    unknown = [name for name in args.sweep or [] if name not in performance_functions.SWEEPS]
+    if unknown:
+        parser.error('unknown sweep ' + ', '.join(unknown) + ', choose from '
+                     + ', '.join(performance_functions.SWEEPS))
+    if args.import_time:
+        rows = performance_functions.import_time_benchmark(repeats=args.iterations)
+        return 0 if all(row['within_budget'] for row in rows) else 1
+    if args.kernel:
+        performance_functions.kernel_performance(out_dir=args.out_dir, seed=args.seed)
+        return 0
+    performance_functions.performance_evaluation(args.iterations, args.sweep, out_dir=args.out_dir, plot=args.plot,
+                                                 num_generations=args.num_generations, seed=args.seed)
+    return 0
+
+
+# The state is a JSON list of [x, y] pairs, a file holding one, or a solve --json result
+def load_state(text):
+    if os.path.exists(text):
+        with open(text) as file:
+            text = file.read()
+    value = json.loads(text)
+    return value['best_state'] if isinstance(value, dict) else value
+
+
+def render_command(args):
+    from render import BoardRenderer, headless
+    state = load_state(args.state)
+    if args.remove_attacking:
+        from chess import remove_attacking_pieces
+        state = remove_attacking_pieces(state, args.table_size, args.piece)
+    if not args.show:
+        headless()
+    renderer = BoardRenderer(args.table_size, args.piece, args.pixels)
+    print(renderer.save(state, args.out))
+    if args.show:
+        renderer.show(state)
+
+
+def add_config_args(parser):
+    for name, kind, text in CONFIG_ARGS:
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, type=kind, default=None, help=text)
+    for flag, _, _ in CONFIG_SWITCHES:
+        parser.add_argument('--' + flag, action='store_true')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='N-Queens.py',
+                                     description='Place as many non attacking pieces as fit on the board')
+    commands = parser.add_subparsers(dest='command')
+
+    solve = commands.add_parser('solve', help='run the genetic algorithm')
+    add_config_args(solve)
+    solve.add_argument('--evaluator', default='serial', help='serial, thread or process')
+    solve.add_argument('--workers', type=int, default=None)
+    solve.add_argument('--profile', nargs='?', const='profile.json', default=None, metavar='TRACE',
+                       help='print per stage timings and write a JSON trace (default profile.json)')
+    solve.add_argument('--json', action='store_true', help='print the result as JSON instead of the summary')
+    solve.add_argument('--image', default='board.png', help='where the board of the best state is written')
+    solve.add_argument('--no-image', action='store_true')
+    solve.add_argument('--show', action='store_true', help='show the board in a window')
+
+    enumerate = commands.add_parser('enumerate', help='collect distinct solutions of a board')
+    add_config_args(enumerate)
+    enumerate.add_argument('--max-solutions', type=int, default=None, help='stop after this many new solutions')
+    enumerate.add_argument('--max-runs', type=int, default=None, help='stop after this many GA runs')
+    enumerate.add_argument('--time-budget-total', type=float, default=None, help='stop after this many seconds')
+    enumerate.add_argument('--out', default=None, help='JSON lines file the solutions are appended to')
+
+    bench = commands.add_parser('bench', help='run the benchmarks')
+    bench.add_argument('--sweep', nargs='+', default=None, help='parameters to sweep, all by default')
+    bench.add_argument('--iterations', type=int, default=10, help='runs per value')
+    bench.add_argument('--num-generations', type=int, default=NUM_GENERATIONS)
+    bench.add_argument('--seed', type=int, default=None)
+    bench.add_argument('--out-dir', default='benchmarks')
+    bench.add_argument('--plot', action='store_true', help='also write the sweep plots')
+    bench.add_argument('--kernel', action='store_true', help='compiled kernel against the NumPy fitness')
+    bench.add_argument('--import-time', action='store_true', help='check the start up time budgets')
+
+    render = commands.add_parser('render', help='write the board of a state to a PNG')
+    render.add_argument('state', help='JSON list of [x, y] pairs, or a file holding one or a solve --json result')
+    render.add_argument('--table-size', type=int, default=TABLE_SIZE)
+    render.add_argument('--piece', default=PIECE)
+    render.add_argument('--pixels', type=int, default=768)
+    render.add_argument('--out', default='board.png')
+    render.add_argument('--remove-attacking', action='store_true', help='leave out the attacked pieces')
+    render.add_argument('--show', action='store_true', help='also show the board in a window')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        args = parser.parse_args(['solve'])
+    if args.command == 'bench':
+        return bench_command(args, parser)
+    if args.command == 'render':
+        render_command(args)
+    elif args.command == 'enumerate':
+        enumerate_command(args)
+    else:
+        solve_command(args)
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,140 @@
+from functools import lru_cache
+import numpy as np
+
+"""
+Attack models, one object per piece type built once per table size.
+
+Squares are numbered x * table_size + y. Queens, bishops and rooks attack along lines, so every
+square gets a precomputed id for each line it sits on and two squares attack each other when
+they share one of those ids. Knights get a precomputed table of the squares they attack.
+Both answer "does square a attack square b" in O(1).
+
+Square ids only exist for squares on the board. A state with pieces off the board, like the
+(-1, -1) of the pieces remove_attacking_pieces takes away, goes through attacked_in_state, which
+checks it pair by pair with coordinate_attacks, the piece_logic rule on raw coordinates.
+"""
+
+# Relative (x, y) squares a knight attacks, (0, 0) is included since two pieces on
+# the same square count as attacking each other
+KNIGHT_MOVES = [(0, 0), (2, -1), (-2, -1), (2, 1), (-2, 1), (1, 2), (-1, 2), (1, -2), (-1, -2)]
+
+
+# piece_logic on raw coordinates for a piece on (x, y) and a later one on (x2, y2), also defined
+# off the board, line pieces compare the coordinates as they are and knights only count when
+# (x2, y2) is within 0..table_size
+def coordinate_attacks(x, y, x2, y2, piece, table_size):
+    if piece == 'bK':
+        return (x2 - x, y2 - y) in KNIGHT_MOVES and 0 <= x2 <= table_size and 0 <= y2 <= table_size
+    on_diagonal = abs(x - x2) == abs(y - y2)
+    if piece == 'bQ':
+        return y == y2 or on_diagonal
+    if piece == 'bB':
+        return on_diagonal
+    return x == x2 or y == y2
+
+
+class AttackModel:
+    def __init__(self, piece, table_size):
+        self.piece = piece
+        self.table_size = table_size
+        self.num_squares = table_size * table_size
+
+    def on_board(self, x, y):
+        return 0 <= x < self.table_size and 0 <= y < self.table_size
+
+    def square(self, x, y):
+        if not self.on_board(x, y):
+            raise ValueError("(" + str(x) + ", " + str(y) + ") is off the board")
+        return x * self.table_size + y
+
+    # list of square ids for a state of [x, y] pairs, all on the board
+    def squares(self, state):
+        size = self.table_size
+        squares = [x * size + y for x, y in state]
+        if not all(0 <= x < size and 0 <= y < size for x, y in state):
+            raise ValueError("state has pieces off the board, use attacked_in_state")
+        return squares
+
+    def attacks(self, a, b):
+        raise NotImplementedError
+
+    # For each piece, True if a piece later in the state attacks it, runs in O(len(state))
+    def attacked_by_later(self, squares):
+        raise NotImplementedError
+
+    # attacked_by_later for a state of [x, y] pairs, pieces off the board are checked pair by pair
+    def attacked_in_state(self, state):
+        if all(self.on_board(x, y) for x, y in state):
+            return self.attacked_by_later(self.squares(state))
+        return [any(coordinate_attacks(x, y, x2, y2, self.piece, self.table_size) for x2, y2 in state[i + 1:])
+                for i, (x, y) in enumerate(state)]
+
+
+class LineAttackModel(AttackModel):
+    def __init__(self, piece, table_size):
+        super().__init__(piece, table_size)
+        x, y = np.divmod(np.arange(self.num_squares), table_size)
+        lines = {'rows': (x, table_size),
+                 'columns': (y, table_size),
+                 'diagonals': (x - y + table_size - 1, 2 * table_size - 1),
+                 'anti_diagonals': (x + y, 2 * table_size - 1)}
+        kinds = {'bQ': ['columns', 'diagonals', 'anti_diagonals'],
+                 'bB': ['diagonals', 'anti_diagonals'],
+                 'bR': ['rows', 'columns']}
+        # line_ids[k][square] is the id of the k-th line the square sits on
+        self.line_ids = [lines[kind][0] for kind in kinds[piece]]
+        self.num_lines = [lines[kind][1] for kind in kinds[piece]]
+        self._ids = [ids.tolist() for ids in self.line_ids]
+
+    def attacks(self, a, b):
+        for ids in self._ids:
+            if ids[a] == ids[b]:
+                return True
+        return False
+
+    def attacked_by_later(self, squares):
+        attacked = [False] * len(squares)
+        for ids in self._ids:
+            seen = set()
+            for i in range(len(squares) - 1, -1, -1):
+                line = ids[squares[i]]
+                if line in seen:
+                    attacked[i] = True
+                else:
+                    seen.add(line)
+        return attacked
+
+
+class KnightAttackModel(AttackModel):
+    def __init__(self, piece, table_size):
+        super().__init__(piece, table_size)
+        # targets[square] lists the squares attacked from it, padded with the
+        # off-board sentinel square num_squares so every row has the same length
+        targets = np.full((self.num_squares, len(KNIGHT_MOVES)), self.num_squares, dtype=np.int64)
+        for x in range(table_size):
+            for y in range(table_size):
+                for k, (dx, dy) in enumerate(KNIGHT_MOVES):
+                    if 0 <= x + dx < table_size and 0 <= y + dy < table_size:
+                        targets[x * table_size + y, k] = (x + dx) * table_size + (y + dy)
+        self.targets = targets
+        self._target_sets = [frozenset(row) - {self.num_squares} for row in targets.tolist()]
+
+    def attacks(self, a, b):
+        return b in self._target_sets[a]
+
+    def attacked_by_later(self, squares):
+        attacked = [False] * len(squares)
+        seen = set()
+        for i in range(len(squares) - 1, -1, -1):
+            if not seen.isdisjoint(self._target_sets[squares[i]]):
+                attacked[i] = True
+            seen.add(squares[i])
+        return attacked
+
+
+# Built once per (piece, table size) and reused by every caller
+@lru_cache(maxsize=None)
+def get_attack_model(piece, table_size):
+    if piece == 'bK':
+        return KnightAttackModel(piece, table_size)
+    return LineAttackModel(piece, table_size)
@@ -0,0 +1,132 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import csv
+import json
+import os
+import time
+from attacks import get_attack_model
+from config import GAConfig
+from ga import solve
+
+"""
+Batch solve mode, runs many (table_size, piece, seed) jobs in one process pool.
+
+A job list is a JSON list of objects or a CSV file with a header, every column is a GAConfig
+argument (table_size, piece, seed, pop_size, ...), missing ones take the constants.py value.
+Jobs are sorted by board so a worker keeps hitting the attack tables it already built, and the
+tables of every board are built once in the parent before the pool starts so forked workers
+inherit them. Every finished job is appended to a JSON lines file straight away, so the results
+so far survive a crash and resume skips the jobs whose results are already in the file, matched
+on the job fields rather than the position in the list.
+"""
+
+# GAConfig arguments and how to read them from a CSV cell
+JOB_FIELDS = {'table_size': int, 'piece': str, 'seed': int, 'pop_size': int, 'init_size': int,
+              'num_parents': int, 'num_generations': int, 'mutate_chance': float, 'selection': str,
+              'tournament_size': int, 'crossover': str, 'mutation': str, 'strategy': str,
+              'memetic_steps': int, 'stall_limit': int, 'time_budget': float,
+              'cache_size': int, 'trace_path': str,
+              'incremental': lambda value: str(value).lower() in ['1', 'true', 'yes'],
+              'adaptive': lambda value: str(value).lower() in ['1', 'true', 'yes']}
+
+
+# Reads a JSON or CSV job list, every job is a dict of GAConfig arguments
+def load_jobs(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as file:
+            rows = list(csv.DictReader(file))
+    else:
+        with open(path) as file:
+            rows = json.load(file)
+
+    jobs = []
+    for row in rows:
+        job = {}
+        for key, value in row.items():
+            if key not in JOB_FIELDS:
+                raise ValueError("unknown job field " + str(key))
+            if value not in ['', None]:
+                job[key] = JOB_FIELDS[key](value)
+        jobs.append(job)
+    return jobs
+
+
+def job_config(job):
+    return GAConfig(verbose=False, **job)
+
+
+# Runs one job in a worker, returns the JSON record written for it, the job fields go under
+# their own key so they can't overwrite result fields like strategy
+def _solve_job(index, job):
+    result = solve(job_config(job))
+    record = result.to_dict()
+    record.pop('config')
+    record['job'] = index
+    record['job_config'] = job
+    return record
+
+
+# Key of a job on its contents, the same job has the same key wherever it is in the list
+def job_key(job):
+    return json.dumps(job, sort_keys=True)
+
+
+# How many times every job is already in a results file, by job_key
+def finished_jobs(path):
+    done = Counter()
+    if not os.path.exists(path):
+        return done
+    with open(path) as file:
+        for line in file:
+            try:
+                done[job_key(json.loads(line)['job_config'])] += 1
+            except (ValueError, KeyError):
+                # a line cut off by a crash
+                continue
+    return done
+
+
+# Solves every job across a process pool and streams the results to out_path as JSON lines
+def run_batch(jobs, out_path, workers=None, resume=True):
+    # a job is skipped when a result of the same job is in the file, not one at the same index,
+    # so a reordered or longer job list resumes right, a job listed twice has to be there twice
+    done = finished_jobs(out_path) if resume else Counter()
+    pending = []
+    skipped = 0
+    for index, job in enumerate(jobs):
+        key = job_key(job)
+        if done[key] > 0:
+            done[key] -= 1
+            skipped += 1
+        else:
+            pending.append((index, job))
+    # jobs on the same board next to each other, so workers reuse their attack tables
+    pending.sort(key=lambda item: (job_config(item[1]).table_size, job_config(item[1]).piece))
+    for board in sorted({(job_config(job).piece, job_config(job).table_size) for _, job in pending}):
+        get_attack_model(*board)
+
+    tic = time.perf_counter()
+    solved = 0
+    with open(out_path, 'a' if resume else 'w') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_solve_job, index, job) for index, job in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            solved += record['solved']
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    elapsed = time.perf_counter() - tic
+
+    print(str(len(pending)) + ' jobs done, ' + str(solved) + ' solved in ' + str(round(elapsed, 2)) + 's'
+          + (' (' + str(skipped) + ' already in ' + out_path + ')' if skipped else ''))
+    return {'jobs': len(pending), 'skipped': skipped, 'solved': solved, 'wall_time': elapsed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve a list of N-Queens jobs in a process pool')
+    parser.add_argument('jobs', help='JSON or CSV job list')
+    parser.add_argument('out', help='JSON lines results file')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-resume', action='store_true', help='overwrite out instead of skipping finished jobs')
+    args = parser.parse_args()
+    run_batch(load_jobs(args.jobs), args.out, args.workers, not args.no_resume)
@@ -0,0 +1,133 @@
+from functools import lru_cache
+import numpy as np
+from attacks import get_attack_model, KNIGHT_MOVES
+
+"""
+Bitboards, a board as one Python int with bit x * table_size + y set for every occupied square,
+the same square numbering as attacks.py. A bitboard has no chromosome order, its pieces are
+taken in square order, so "attacked by a later piece" means attacked from a higher square, which
+is what count_safe_pieces gives for the state listed square by square.
+
+Conflicts are checked on the whole board at once instead of piece by piece
+
+    lines    for every row, column or diagonal the piece moves on that holds two or more pieces,
+             the board AND the line mask, all pieces on it but the highest one are attacked
+    knights  for the 4 moves that go to a higher square, the board shifted down by the move AND
+             the board AND the squares the move stays on the board from
+
+so a check costs one big int operation of table_size^2 bits per crowded line, or 4 for knights,
+which keeps 200x200 knight boards with 20000 pieces well under a millisecond. Per square attack
+masks (attack_mask) are built from the same line masks and knight moves, they are kept in a
+table for boards up to MASK_TABLE_MAX and built on demand above, a full table of 200x200 masks
+would take hundreds of MB.
+"""
+
+# Largest table size the per square attack masks are precomputed for
+MASK_TABLE_MAX = 64
+
+
+# Packs a flat table_size^2 boolean array into a bitboard
+def pack(occupied):
+    return int.from_bytes(np.packbits(np.asarray(occupied, dtype=np.uint8), bitorder='little').tobytes(), 'little')
+
+
+# Square ids set in a bitboard, in ascending order
+def unpack(bits, num_squares):
+    raw = np.frombuffer(bits.to_bytes((num_squares + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder='little')[:num_squares])
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+# Bitboard of a state of [x, y] pairs, pieces at -1 are left out and doubles collapse
+def to_bitboard(state, table_size):
+    state = np.asarray(state, dtype=np.int64).reshape(-1, 2)
+    state = state[(state[:, 0] >= 0) & (state[:, 1] >= 0)]
+    occupied = np.zeros(table_size * table_size, dtype=bool)
+    occupied[state[:, 0] * table_size + state[:, 1]] = True
+    return pack(occupied)
+
+
+# State of [x, y] pairs in square order
+def from_bitboard(bits, table_size):
+    squares = unpack(bits, table_size * table_size)
+    return np.stack(np.divmod(squares, table_size), axis=1).tolist()
+
+
+class BitboardModel:
+    def __init__(self, piece, table_size):
+        self.piece = piece
+        self.table_size = table_size
+        self.num_squares = table_size * table_size
+        model = get_attack_model(piece, table_size)
+        x, y = np.divmod(np.arange(self.num_squares), table_size)
+        if piece == 'bK':
+            self.line_masks = []
+            # (offset, mask of the squares the move stays on the board from) for moves to higher squares
+            self.shifts = []
+            for dx, dy in KNIGHT_MOVES:
+                offset = dx * table_size + dy
+                if offset > 0:
+                    valid = (x + dx >= 0) & (x + dx < table_size) & (y + dy >= 0) & (y + dy < table_size)
+                    self.shifts.append((offset, pack(valid)))
+        else:
+            self.shifts = []
+            # line_masks[k][line] is the bitboard of the line with id line of the k-th line kind
+            self.line_masks = [[pack(ids == line) for line in range(num_lines)]
+                               for ids, num_lines in zip(model.line_ids, model.num_lines)]
+        self._model = model
+        self._masks = None
+        if table_size <= MASK_TABLE_MAX:
+            self._masks = [self._build_mask(square) for square in range(self.num_squares)]
+
+    def _build_mask(self, square):
+        if self.piece == 'bK':
+            mask = 0
+            for target in self._model._target_sets[square]:
+                mask |= 1 << target
+            return mask
+        mask = 0
+        for masks, ids in zip(self.line_masks, self._model._ids):
+            mask |= masks[ids[square]]
+        return mask
+
+    # Squares a piece on square attacks, its own square included
+    def attack_mask(self, square):
+        if self._masks is not None:
+            return self._masks[square]
+        return self._build_mask(square)
+
+    # Number of pieces of bits attacking square, a piece on square itself is left out
+    def attackers(self, bits, square):
+        return popcount(self.attack_mask(square) & bits & ~(1 << square))
+
+    # Bitboard of the pieces attacked from a higher square
+    def attacked(self, bits):
+        attacked = 0
+        for offset, valid in self.shifts:
+            attacked |= bits & (bits >> offset) & valid
+        if not self.line_masks:
+            return attacked
+        # only the lines holding two or more pieces can have attacked pieces
+        squares = unpack(bits, self.num_squares)
+        for masks, ids in zip(self.line_masks, self._model.line_ids):
+            lines, counts = np.unique(ids[squares], return_counts=True)
+            for line in lines[counts > 1].tolist():
+                on_line = bits & masks[line]
+                attacked |= on_line ^ (1 << (on_line.bit_length() - 1))
+        return attacked
+
+    def count_safe(self, bits):
+        return popcount(bits) - popcount(self.attacked(bits))
+
+    # The board without the attacked pieces, none of the pieces left attack each other
+    def remove_attacking(self, bits):
+        return bits & ~self.attacked(bits)
+
+
+# Built once per (piece, table size) like the attack models
+@lru_cache(maxsize=None)
+def get_bitboard_model(piece, table_size):
+    return BitboardModel(piece, table_size)
@@ -0,0 +1,101 @@
+from queue import Queue, Empty, Full
+import json
+import os
+import threading
+import numpy as np
+
+"""
+Checkpoints of a GA run. A checkpoint is one .npz file holding
+
+    genes       population about to be scored, pop x chromosome x 2
+    fitness     fitness of every row of genes, UNSCORED (-1) for the offspring not scored yet
+    best_state  best individual found so far
+    meta        JSON with the generation to start from, best_result, evaluations, the bit
+                generator state of the run's numpy Generator and the ConvergenceController counters
+
+so resuming from it continues the exact same trajectory. The loop only copies the arrays,
+CheckpointWriter compresses and writes them on a background thread, if a write is still running
+when the next checkpoint comes in the older pending one is dropped. Files are written next to
+the target and renamed over it, an interrupted write never leaves a broken checkpoint behind.
+"""
+
+
+class Checkpoint:
+    def __init__(self, genes, fitness, best_state, generation, best_result, evaluations, rng_state,
+                 controller, table_size, piece):
+        self.genes = genes
+        self.fitness = fitness
+        self.best_state = best_state
+        self.generation = generation
+        self.best_result = best_result
+        self.evaluations = evaluations
+        self.rng_state = rng_state
+        self.controller = controller
+        self.table_size = table_size
+        self.piece = piece
+
+    def meta(self):
+        return {'generation': self.generation, 'best_result': self.best_result, 'evaluations': self.evaluations,
+                'rng_state': self.rng_state, 'controller': self.controller, 'table_size': self.table_size,
+                'piece': self.piece}
+
+
+def save_checkpoint(checkpoint, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as file:
+        np.savez_compressed(file, genes=checkpoint.genes, fitness=checkpoint.fitness,
+                            best_state=checkpoint.best_state, meta=np.array(json.dumps(checkpoint.meta())))
+    os.replace(temp, path)
+    return path
+
+
+def load_checkpoint(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        return Checkpoint(data['genes'], data['fitness'], data['best_state'], meta['generation'],
+                          meta['best_result'], meta['evaluations'], meta['rng_state'], meta['controller'],
+                          meta['table_size'], meta['piece'])
+
+
+class CheckpointWriter:
+    def __init__(self, path):
+        self.path = path
+        self.pending = Queue(maxsize=1)
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    # Hands the checkpoint to the writer thread, replaces one that is still waiting
+    def submit(self, checkpoint):
+        if self.error is not None:
+            raise self.error
+        while True:
+            try:
+                self.pending.put_nowait(checkpoint)
+                return
+            except Full:
+                try:
+                    self.pending.get_nowait()
+                except Empty:
+                    pass
+
+    def _drain(self):
+        while True:
+            checkpoint = self.pending.get()
+            if checkpoint is None:
+                return
+            try:
+                save_checkpoint(checkpoint, self.path)
+                self.written += 1
+            except OSError as error:
+                self.error = error
+
+    # Waits for the last checkpoint to be written
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
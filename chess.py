@@ -1,5 +1,14 @@
-import pygame as p
 from constants import *
+from attacks import get_attack_model, coordinate_attacks
+from bitboard import get_bitboard_model, from_bitboard
+from config import GAConfig
+import numpy as np
+
+# Compiled kernel from nqueens.pyx, used when it has been built
+try:
+    import nqueens
+except ImportError:
+    nqueens = None
 
 """ 
 Displaying the chess board I got help from this youtube video: https://www.youtube.com/watch?v=EnYui0e73Rs
@@ -7,70 +16,25 @@ Queen png image from: https://www.pngfind.com/download/bJmmbw_chess-queen-png-do
 """
 
 
-def print_board(state):
-    # Initializing game constants
-    global WIDTH, HEIGHT, DIMENSIONS, SQ_SIZE, MAX_FPS, IMAGES
-
-    DIMENSIONS = TABLE_SIZE
-    WIDTH = HEIGHT = 768
-    SQ_SIZE = HEIGHT // DIMENSIONS
-    MAX_FPS = 15
-    IMAGES = {'bQ': p.transform.scale(p.image.load("./bQ.png"), (SQ_SIZE, SQ_SIZE)),
-              'bB': p.transform.scale(p.image.load("./bB.png"), (SQ_SIZE, SQ_SIZE)),
-              'bK': p.transform.scale(p.image.load("./bK.png"), (SQ_SIZE, SQ_SIZE)),
-              'bR': p.transform.scale(p.image.load("./bR.png"), (SQ_SIZE, SQ_SIZE))
-              }
-    # Initialize game stuff
-    p.init()
-    screen = p.display.set_mode((WIDTH, HEIGHT))
-    clock = p.time.Clock()
-    screen.fill(p.Color("white"))
-    gs = GameState(state)
-    running = True
-
-    # Loop & draw board until user presses exit
-    while running:
-        for e in p.event.get():
-            if e.type == p.QUIT:
-                running = False
-        draw_game_state(screen, gs)
-        clock.tick(MAX_FPS)
-        p.display.flip()
-        if not running:
-            p.display.quit()
-
-
-def draw_game_state(screen, gs):
-    # draw squares on the board
-    draw_board(screen)
-    # draw pieces on the board
-    draw_pieces(screen, gs.board)
-
-
-def draw_board(screen):
-    colors = [p.Color((240, 217, 181)), p.Color((181, 136, 99))]
-
-    for r in range(DIMENSIONS):
-        for c in range(DIMENSIONS):
-            color = colors[((r + c) % 2)]
-            p.draw.rect(screen, color, p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
-
-
-def draw_pieces(screen, board):
-    for r in range(DIMENSIONS):
-        for c in range(DIMENSIONS):
-            piece = board[c][r]
-            if piece != '--':
-                screen.blit(IMAGES[piece], p.Rect(c * SQ_SIZE, r * SQ_SIZE, SQ_SIZE, SQ_SIZE))
+# Shows the state on a board of config.table_size in a window, the constants.py values by default,
+#   see render.py for the headless PNG export
+def print_board(state, config=None):
+    from render import BoardRenderer
+    config = config if config is not None else GAConfig()
+    BoardRenderer(config.table_size, config.piece).show(state)
 
 
 class GameState:
-    def __init__(self, state):
+    def __init__(self, state, config=None):
+        self.config = config if config is not None else GAConfig()
         self.state = state
-        self.board = set_state(self.state, PIECE, TABLE_SIZE)
+        self.board = set_state(self.state, self.config.piece, self.config.table_size)
 
 
+# state is a list of [x, y] pairs or a bitboard, see bitboard.py
 def set_state(state, piece_type, table_size):
+    if isinstance(state, int):
+        state = from_bitboard(state, table_size)
     board = [[[] for i in range(table_size)] for i in range(table_size)]
 
     # Set all cells to empty
@@ -86,69 +50,42 @@ def set_state(state, piece_type, table_size):
     return board
 
 
+# Checks if the piece on (row, col) and the piece on (row2, col2) attack each other
 def piece_logic(row, row2, col, col2, piece, table_size):
-    logic_dict = {'bQ': col == col2 or abs(row - row2) == abs(col - col2),
-                  'bB': abs(row - row2) == abs(col - col2),
-                  'bR': (row == row2 and col == col2) or col == col2 or row == row2,
-                  'bK':
-                      (
-                              ((row == row2 and col == col2) if
-                               (0 <= row <= table_size and 0 <= col <= table_size) else False) or
-                              (((row + 2) == row2 and (col - 1) == col2) if
-                               (0 <= (row + 2) <= table_size and 0 <= (col - 1) <= table_size) else False) or
-                              (((row - 2) == row2 and (col - 1) == col2) if
-                               (0 <= (row - 2) <= table_size and 0 <= (col - 1) <= table_size) else False) or
-                              (((row + 2) == row2 and (col + 1) == col2) if
-                               (0 <= (row + 2) <= table_size and 0 <= (col + 1) <= table_size) else False) or
-                              (((row - 2) == row2 and (col + 1) == col2) if
-                               (0 <= (row - 2) <= table_size and 0 <= (col + 1) <= table_size) else False) or
-                              (((row + 1) == row2 and (col + 2) == col2) if
-                               (0 <= (row + 1) <= table_size and 0 <= (col + 2) <= table_size) else False) or
-                              (((row - 1) == row2 and (col + 2) == col2) if
-                               (0 <= (row - 1) <= table_size and 0 <= (col + 2) <= table_size) else False) or
-                              (((row + 1) == row2 and (col - 2) == col2) if
-                               (0 <= (row + 1) <= table_size and 0 <= (col - 2) <= table_size) else False) or
-                              (((row - 1) == row2 and (col - 2) == col2) if
-                               (0 <= (row - 1) <= table_size and 0 <= (col - 2) <= table_size) else False)
-                      )
-
-                  }
-    return logic_dict[piece]
-
-
-# removes the queens that are under attack for displaying a solution
+    model = get_attack_model(piece, table_size)
+    if not (model.on_board(row, col) and model.on_board(row2, col2)):
+        return coordinate_attacks(row, col, row2, col2, piece, table_size)
+    return model.attacks(model.square(row, col), model.square(row2, col2))
+
+
+# removes the queens that are under attack for displaying a solution,
+#   a bitboard comes back as a bitboard without the attacked pieces
 def remove_attacking_pieces(state, table_size, piece):
+    if isinstance(state, int):
+        return get_bitboard_model(piece, table_size).remove_attacking(state)
     print("original" + str(state))
-    state_copy = state.copy()
-    for i in range(0, len(state)):
-        xy_pos_1 = state[i]
-        for j in range(i + 1, len(state)):
-            xy_pos_2 = state[j]
-            x1, x2, y1, y2 = xy_pos_1[0], xy_pos_2[0], xy_pos_1[1], xy_pos_2[1]
-            # checks is other queens are under attack, if so remove the current queen
-            if piece_logic(x1, x2, y1, y2, piece, table_size):
-                state_copy[i][0] = -1
-                state_copy[i][1] = -1
-                break
+    attacked = get_attack_model(piece, table_size).attacked_in_state(state)
+    state_copy = [list(xy_pos) for xy_pos in state]
+    for i in range(len(state_copy)):
+        # checks is other queens are under attack, if so remove the current queen
+        if attacked[i]:
+            state_copy[i][0] = -1
+            state_copy[i][1] = -1
 
     print("copy" + str(state_copy))
     return state_copy
 
 
 # Check if piece is attacking another piece
+#   note: uses the compiled kernel from nqueens.pyx when it has been built, a bitboard
+#   is checked with whole board bit operations, its pieces are taken in square order
 def count_safe_pieces(state, table_size, piece):
-    safe_pieces = 0
-    for i in range(0, len(state)):
-        safe = True
-        xy_pos_1 = state[i]
-        # checks if pieces are under attack
-        for j in range(i + 1, len(state)):
-            xy_pos_2 = state[j]
-            x1, x2, y1, y2 = xy_pos_1[0], xy_pos_2[0], xy_pos_1[1], xy_pos_2[1]
-            if piece_logic(x1, x2, y1, y2, piece, table_size):
-                safe = False
-                break
-        if safe:
-            safe_pieces += 1
-    return safe_pieces
-
+    if isinstance(state, int):
+        return get_bitboard_model(piece, table_size).count_safe(state)
+    if nqueens is not None and len(state) > 0:
+        genes = np.asarray(state, dtype=np.int64).reshape(-1, 2)
+        # the kernel skips pieces off the board, those states take the Python path
+        if genes.min() >= 0 and genes.max() < table_size:
+            return nqueens.count_safe_pieces(genes, table_size, piece)
+    attacked = get_attack_model(piece, table_size).attacked_in_state(state)
+    return len(state) - sum(attacked)
@@ -0,0 +1,102 @@
+from constants import *
+
+"""
+Run configuration. A GAConfig holds every hyper parameter of one run, the defaults come from
+constants.py, so two configurations can live in the same process or be sent to a worker pool.
+"""
+
+
+class GAConfig:
+    def __init__(self, table_size=TABLE_SIZE, piece=PIECE, pop_size=POP_SIZE, init_size=INIT_SIZE,
+                 num_parents=NUM_PARENTS, num_generations=NUM_GENERATIONS, mutate_chance=MUTATE_CHANCE,
+                 selection=SELECTION, tournament_size=TOURNAMENT_SIZE, crossover=CROSSOVER,
+                 mutation=MUTATION, incremental=False, seed=None, verbose=True, strategy='analytic',
+                 memetic_steps=0, adaptive=False, stall_limit=None, time_budget=None,
+                 cache_size=0, reporter='print', report_every=1, report_interval=0.0, report_path=None,
+                 checkpoint_path=None, checkpoint_every=100, resume=False, trace_path=None):
+        self.table_size = table_size
+        self.piece = piece
+        self.pop_size = pop_size
+        self.init_size = init_size
+        self.num_parents = num_parents
+        self.num_generations = num_generations
+        self.mutate_chance = mutate_chance
+        self.selection = selection
+        self.tournament_size = tournament_size
+        self.crossover = crossover
+        self.mutation = mutation
+        self.incremental = incremental
+        self.seed = seed
+        self.verbose = verbose
+        # 'analytic' returns the constructors.py placement when there is one and runs the GA
+        # otherwise, 'seeded' puts that placement in the first GA population, 'ga' only searches
+        self.strategy = strategy
+        # min conflicts moves spent on every selected parent per generation, 0 turns it off
+        self.memetic_steps = memetic_steps
+        # adaptive mutation and restarts on stagnation, stop after stall_limit generations
+        # without improvement or after time_budget seconds, see convergence.py
+        self.adaptive = adaptive
+        self.stall_limit = stall_limit
+        self.time_budget = time_budget
+        # states kept in the LRU fitness cache, 0 turns it off, see fitness_cache.py
+        self.cache_size = cache_size
+        # progress output, 'silent', 'print' or 'jsonl' written to report_path (stdout when None),
+        # every report_every generations and at most once per report_interval seconds
+        self.reporter = reporter
+        self.report_every = report_every
+        self.report_interval = report_interval
+        self.report_path = report_path
+        # .npz checkpoint written every checkpoint_every generations, resume continues from it
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        # per generation trace, .jsonl or columnar .trace, + .gz to compress, see traces.py
+        self.trace_path = trace_path
+
+    # Most pieces that fit on this board, the fitness of a perfect state
+    @property
+    def chromosome_max(self):
+        return chromosome_max(self.table_size, self.piece)
+
+    # Copy of the config with some values changed
+    def replace(self, **changes):
+        values = self.to_dict()
+        values.update(changes)
+        return GAConfig(**values)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return 'GAConfig(' + ', '.join(key + '=' + repr(value) for key, value in vars(self).items()) + ')'
+
+
+class SolveResult:
+    def __init__(self, best_state, best_result, generations, evaluations, timings, config, strategy='ga',
+                 stop_reason=None):
+        self.best_state = best_state
+        self.best_result = best_result
+        self.generations = generations
+        self.evaluations = evaluations
+        self.timings = timings
+        self.config = config
+        self.strategy = strategy
+        # 'solved', 'generations', 'stalled' or 'time_budget'
+        self.stop_reason = stop_reason
+        # hit and miss statistics of the fitness cache, None when it is off
+        self.cache = None
+
+    # True when the best state holds the most pieces that fit on the board
+    @property
+    def solved(self):
+        return self.best_result == self.config.chromosome_max
+
+    def to_dict(self):
+        return {'best_state': self.best_state, 'best_result': self.best_result, 'solved': self.solved,
+                'generations': self.generations, 'evaluations': self.evaluations,
+                'timings': self.timings, 'strategy': self.strategy,
+                'stop_reason': self.stop_reason, 'cache': self.cache, 'config': self.config.to_dict()}
+
+    def __repr__(self):
+        return ('SolveResult(best_result=' + str(self.best_result) + ', solved=' + str(self.solved)
+                + ', generations=' + str(self.generations) + ', strategy=' + repr(self.strategy) + ')')
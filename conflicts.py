@@ -0,0 +1,148 @@
+from bisect import insort
+from attacks import get_attack_model
+
+"""
+Incremental fitness for one individual.
+
+Every piece is placed in occupancy buckets, one per line it sits on for queens, bishops and rooks
+or one per square for knights, each bucket is a sorted list of chromosome indices. A piece is
+attacked when a bucket it watches holds a later index. Moving one piece only changes the buckets
+it leaves and enters, so only the pieces watching those buckets are rechecked.
+
+Copies are copy on write, a copy shares the bucket lists and the [x, y] rows of its source and a
+bucket is only copied by the first move that changes it on either side, a row is replaced and
+never changed in place. Crossover copies a parent for every child and moves a few of its genes,
+so a child costs the moved genes instead of a copy of every bucket.
+
+GAConfig.incremental runs the GA on these states. Every move is Python work, so as a GA mode it
+is slower than the batch path on every board measured, 2x for 60x60 knights and up to 7x for
+queens and rooks whose lines the batch path scores fastest. It only supports one point crossover,
+reset mutation rolled once per generation and no fitness cache, solve refuses other settings.
+ConflictState is worth it where single genes change between fitness queries, the min conflicts
+repair of local_search.py scores every candidate square in O(1) with it.
+"""
+
+
+class ConflictState:
+    def __init__(self, state, table_size, piece, model=None):
+        self.table_size = table_size
+        self.piece = piece
+        self.model = model if model is not None else get_attack_model(piece, table_size)
+        self.state = [list(xy_pos) for xy_pos in state]
+        self.squares = self.model.squares(self.state)
+        self.occupancy = [dict() for _ in range(self._num_kinds())]
+        for i, square in enumerate(self.squares):
+            for kind, key in self._place(square):
+                self.occupancy[kind].setdefault(key, []).append(i)
+        # keys of the buckets only this state holds, the others are shared with a copy
+        self._owned = [set(kind) for kind in self.occupancy]
+        self.attacked = self.model.attacked_by_later(self.squares)
+        self.fitness = len(self.squares) - sum(self.attacked)
+
+    def __len__(self):
+        return len(self.state)
+
+    def __getitem__(self, index):
+        return self.state[index]
+
+    def copy(self):
+        child = ConflictState.__new__(ConflictState)
+        child.table_size = self.table_size
+        child.piece = self.piece
+        child.model = self.model
+        child.state = list(self.state)
+        child.squares = list(self.squares)
+        child.occupancy = [dict(kind) for kind in self.occupancy]
+        # every bucket is shared now, whichever side moves first copies it
+        child._owned = [set() for _ in self.occupancy]
+        self._owned = [set() for _ in self.occupancy]
+        child.attacked = list(self.attacked)
+        child.fitness = self.fitness
+        return child
+
+    # Moves the piece at index to (x, y) and updates the fitness, returns the new fitness
+    def move(self, index, x, y):
+        old = self.squares[index]
+        new = self.model.square(x, y)
+        self.state[index] = [x, y]
+        if old == new:
+            return self.fitness
+
+        for kind, key in self._place(old):
+            bucket = self._writable(kind, key)
+            bucket.remove(index)
+            if not bucket:
+                del self.occupancy[kind][key]
+        self.squares[index] = new
+        for kind, key in self._place(new):
+            insort(self._writable(kind, key), index)
+
+        affected = self._watchers(old)
+        affected.update(self._watchers(new))
+        affected.add(index)
+        for i in affected:
+            attacked = self._is_attacked(i)
+            if attacked != self.attacked[i]:
+                self.fitness += -1 if attacked else 1
+                self.attacked[i] = attacked
+        return self.fitness
+
+    # New individual made of self[:cut] + other[cut:], only genes that differ are moved
+    def splice(self, other, cut):
+        child = self.copy()
+        for i in range(cut, len(other)):
+            if child.squares[i] != other.squares[i]:
+                child.move(i, other.state[i][0], other.state[i][1])
+        return child
+
+    # Conflicts a piece on square would have, leaving out the piece at index. A piece sharing
+    # two lines with square counts twice, which is what min conflicts wants to minimize
+    #   note: one bucket length per line (or per knight target), so O(1) for every square
+    def conflicts_at(self, square, index=None):
+        own = set(self._place(self.squares[index])) if index is not None else set()
+        total = 0
+        for kind, key in self._watch(square):
+            bucket = self.occupancy[kind].get(key)
+            if bucket:
+                total += len(bucket) - ((kind, key) in own)
+        return total
+
+    # Bucket of key this state can change, a shared bucket is copied first
+    def _writable(self, kind, key):
+        buckets = self.occupancy[kind]
+        bucket = buckets.get(key)
+        if bucket is None or key not in self._owned[kind]:
+            bucket = list(bucket) if bucket is not None else []
+            buckets[key] = bucket
+            self._owned[kind].add(key)
+        return bucket
+
+    def _num_kinds(self):
+        return 1 if self.piece == 'bK' else len(self.model.line_ids)
+
+    # Buckets a piece on square is stored in
+    def _place(self, square):
+        if self.piece == 'bK':
+            return [(0, square)]
+        return [(kind, ids[square]) for kind, ids in enumerate(self.model._ids)]
+
+    # Buckets a piece on square is attacked from
+    def _watch(self, square):
+        if self.piece == 'bK':
+            return [(0, target) for target in self.model._target_sets[square]]
+        return self._place(square)
+
+    # Indices of the pieces watching the buckets of square, attacks are symmetric so
+    # these are the pieces inside the buckets watched from square
+    def _watchers(self, square):
+        watchers = set()
+        for kind, key in self._watch(square):
+            watchers.update(self.occupancy[kind].get(key, ()))
+        return watchers
+
+    def _is_attacked(self, i):
+        for kind, key in self._watch(self.squares[i]):
+            bucket = self.occupancy[kind].get(key)
+            if bucket and bucket[-1] > i:
+                return True
+        return False
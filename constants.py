@@ -14,15 +14,30 @@ NUM_PARENTS = 2
 NUM_GENERATIONS = 100
 MUTATE_CHANCE = 0.95
 PIECE = KNIGHT
+# Parent selection, one of 'best', 'tournament' or 'roulette'
+SELECTION = 'best'
+TOURNAMENT_SIZE = 3
+# Crossover 'one_point', or 'pmx' / 'order' for queens and rooks, use them with the 'swap' MUTATION
+CROSSOVER = 'one_point'
+MUTATION = 'reset'
+
+
+
+# Most pieces that fit on the board without attacking each other
+def chromosome_max(table_size, piece):
+    k = int((table_size - 1) / 2)
+    maxima = {
+                QUEEN: table_size,
+                BISHOP: 2 * table_size - 2,
+                ROOK: table_size,
+                KNIGHT: int((table_size * table_size) / 2) if (table_size % 2 == 0) else int(2*(k*k + k) + 1)
+             }
+    return maxima[piece]
+
 
 # Extra
 K = int((TABLE_SIZE - 1)/2)
-CHROMOSOME_MAX = {
-                    QUEEN: TABLE_SIZE,
-                    BISHOP: 2 * TABLE_SIZE - 2,
-                    ROOK: TABLE_SIZE,
-                    KNIGHT: int((TABLE_SIZE * TABLE_SIZE) / 2) if (TABLE_SIZE % 2 == 0) else int(2*(K*K + K) + 1)
-                  }
+CHROMOSOME_MAX = {piece: chromosome_max(TABLE_SIZE, piece) for piece in [QUEEN, BISHOP, ROOK, KNIGHT]}
 
 """
 Best values for 50 size
@@ -0,0 +1,62 @@
+from chess import count_safe_pieces
+from constants import *
+
+"""
+Analytic placements, a perfect state for every piece built in O(table_size) or O(table_size^2)
+for knights, instead of searching for one.
+
+    queens   the classic construction, even columns first then odd ones with the
+             fix ups for table_size % 6 == 2 or 3, there is none for 2 and 3
+    rooks    the main diagonal
+    bishops  the whole first row and the last row without its corners
+    knights  every square of one color
+
+Queens and rooks come back with x = range(table_size) like create_population makes them, so the
+states can be put straight into a GA population.
+"""
+
+STRATEGIES = ['analytic', 'seeded', 'ga']
+
+
+def construct_queens(table_size):
+    if table_size in [2, 3]:
+        return None
+    evens = list(range(2, table_size + 1, 2))
+    odds = list(range(1, table_size + 1, 2))
+    if table_size % 6 == 2:
+        odds = [3, 1] + odds[2:]
+        odds.remove(5)
+        odds.append(5)
+    elif table_size % 6 == 3:
+        evens = evens[1:] + [2]
+        odds = odds[2:] + [1, 3]
+    return [[x, y - 1] for x, y in enumerate(evens + odds)]
+
+
+def construct_rooks(table_size):
+    return [[x, x] for x in range(table_size)]
+
+
+def construct_bishops(table_size):
+    if table_size < 2:
+        return []
+    return [[0, y] for y in range(table_size)] + [[table_size - 1, y] for y in range(1, table_size - 1)]
+
+
+def construct_knights(table_size):
+    return [[x, y] for x in range(table_size) for y in range(table_size) if (x + y) % 2 == 0]
+
+
+CONSTRUCTORS = {QUEEN: construct_queens, ROOK: construct_rooks, BISHOP: construct_bishops, KNIGHT: construct_knights}
+
+
+# Perfect state for the board, checked with count_safe_pieces, None when there is no construction
+def construct(table_size, piece):
+    state = CONSTRUCTORS[piece](table_size)
+    if state is None:
+        return None
+    if len(state) != chromosome_max(table_size, piece):
+        return None
+    if count_safe_pieces(state, table_size, piece) != len(state):
+        return None
+    return state
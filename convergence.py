@@ -0,0 +1,107 @@
+import time
+import numpy as np
+from population import Population
+
+"""
+Convergence controller for the generation loop. It keeps the best fitness history and the
+population diversity (share of distinct individuals) and decides
+
+    mutate_chance   goes up by BOOST every STAGNATION_WINDOW generations without improvement,
+                    and back to the base value as soon as the best result improves
+    mutate_genes    genes mutated per child, grows the same way (1, 2, 3) and goes back to 1
+                    on improvement or restart, a chance already close to 1.0 can't go up so
+                    this is what strengthens the mutation of a stalled run
+    restart         after RESTART_AFTER boosts in a row part of the population is replaced with
+                    new random individuals, also when the diversity falls under MIN_DIVERSITY
+    stop            when stall_limit generations went by without improvement or the
+                    time_budget in seconds is used up
+"""
+
+STAGNATION_WINDOW = 20
+BOOST = 1.5
+RESTART_AFTER = 3
+RESTART_FRACTION = 0.5
+MIN_DIVERSITY = 0.05
+
+
+# Share of distinct individuals in a Population or a list of states
+def diversity(population):
+    if len(population) == 0:
+        return 0.0
+    if isinstance(population, Population):
+        genes = np.ascontiguousarray(population.genes.reshape(len(population), -1))
+        rows = genes.view(np.dtype((np.void, genes.dtype.itemsize * genes.shape[1])))
+        return len(np.unique(rows)) / len(population)
+    return len({tuple(map(tuple, state)) for state in population}) / len(population)
+
+
+class ConvergenceController:
+    def __init__(self, mutate_chance, adaptive=True, stall_limit=None, time_budget=None):
+        self.base_mutate_chance = mutate_chance
+        self.mutate_chance = mutate_chance
+        self.mutate_genes = 1
+        self.adaptive = adaptive
+        self.stall_limit = stall_limit
+        self.time_budget = time_budget
+        self.start = time.perf_counter()
+        self.history = []
+        self.diversity = []
+        self.best = None
+        self.stalled = 0
+        self.boosts = 0
+        self.restarts = 0
+        self.stop_reason = None
+
+    # Records one generation, returns True when part of the population should be restarted
+    def update(self, best_result, population):
+        self.history.append(best_result)
+        self.diversity.append(diversity(population) if self.adaptive else None)
+        if self.best is None or best_result > self.best:
+            self.best = best_result
+            self.stalled = 0
+            self.boosts = 0
+            self.mutate_chance = self.base_mutate_chance
+            self.mutate_genes = 1
+        else:
+            self.stalled += 1
+
+        if self.stall_limit is not None and self.stalled >= self.stall_limit:
+            self.stop_reason = 'stalled'
+        elif self.time_budget is not None and time.perf_counter() - self.start >= self.time_budget:
+            self.stop_reason = 'time_budget'
+        if not self.adaptive:
+            return False
+
+        restart = self.diversity[-1] < MIN_DIVERSITY
+        if self.stalled > 0 and self.stalled % STAGNATION_WINDOW == 0:
+            self.boosts += 1
+            self.mutate_chance = min(1.0, self.mutate_chance * BOOST)
+            self.mutate_genes = int(np.ceil(self.mutate_genes * BOOST))
+            if self.boosts >= RESTART_AFTER:
+                self.boosts = 0
+                self.mutate_genes = 1
+                restart = True
+        if restart:
+            self.restarts += 1
+        return restart
+
+    @property
+    def should_stop(self):
+        return self.stop_reason is not None
+
+    # Counters of the controller, saved with a checkpoint and restored on resume
+    def snapshot(self):
+        return {'mutate_chance': self.mutate_chance, 'mutate_genes': self.mutate_genes, 'best': self.best, 'stalled': self.stalled,
+                'boosts': self.boosts, 'restarts': self.restarts, 'history': list(self.history),
+                'elapsed': time.perf_counter() - self.start}
+
+    # The time budget keeps counting from the elapsed time of the snapshot
+    def restore(self, snapshot):
+        self.mutate_chance = snapshot['mutate_chance']
+        self.mutate_genes = snapshot['mutate_genes']
+        self.best = snapshot['best']
+        self.stalled = snapshot['stalled']
+        self.boosts = snapshot['boosts']
+        self.restarts = snapshot['restarts']
+        self.history = list(snapshot['history'])
+        self.start = time.perf_counter() - snapshot['elapsed']
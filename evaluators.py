@@ -0,0 +1,145 @@
+import math
+import os
+import numpy as np
+from fitness import batch_fitness
+
+"""
+Pluggable fitness evaluators, all of them score a pop x chromosome x 2 gene array with the batch
+fitness engine and return the fitness vector.
+
+    serial   scores the whole array in the calling thread
+    thread   splits the array in chunks scored by a thread pool
+    process  copies the array once into shared memory, the worker processes score their chunk
+             straight out of it and write the result back, so nothing but the chunk bounds
+             is pickled
+
+The pools and shared memory are only imported by the evaluators that use them, they cost more
+import time than the rest of the GA.
+"""
+
+# Smallest number of individuals worth sending to a worker
+MIN_CHUNK = 16
+# Chunks per worker, a few per worker keeps the pool busy when chunks take uneven time
+CHUNKS_PER_WORKER = 4
+
+
+# Chunk size for a population, adapts to the population size and the number of workers
+def chunk_size(pop_size, workers, min_chunk=MIN_CHUNK):
+    return max(min_chunk, math.ceil(pop_size / (workers * CHUNKS_PER_WORKER)))
+
+
+# (start, stop) bounds of the chunks a population is split into
+def chunk_bounds(pop_size, workers, min_chunk=MIN_CHUNK):
+    size = chunk_size(pop_size, workers, min_chunk)
+    return [(start, min(start + size, pop_size)) for start in range(0, pop_size, size)]
+
+
+class SerialEvaluator:
+    def evaluate(self, genes, table_size, piece):
+        return batch_fitness(genes, table_size, piece)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ThreadPoolEvaluator(SerialEvaluator):
+    def __init__(self, workers=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    def evaluate(self, genes, table_size, piece):
+        bounds = chunk_bounds(len(genes), self.workers)
+        if len(bounds) <= 1:
+            return batch_fitness(genes, table_size, piece)
+        parts = self.pool.map(lambda bound: batch_fitness(genes[bound[0]:bound[1]], table_size, piece), bounds)
+        return np.concatenate(list(parts))
+
+    def close(self):
+        self.pool.shutdown()
+
+
+# Scores genes[start:stop] out of the shared buffer and writes the fitness next to them
+def _evaluate_shared(name, shape, dtype, start, stop, table_size, piece):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    genes, fitness = _shared_views(shm, shape, dtype)
+    fitness[start:stop] = batch_fitness(genes[start:stop], table_size, piece)
+    # the views have to go before the block can be closed
+    del genes, fitness
+    shm.close()
+
+
+# Gene and fitness arrays laid out back to back in a shared memory block
+def _shared_views(shm, shape, dtype):
+    genes = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    fitness = np.ndarray((shape[0],), dtype=np.int64, buffer=shm.buf, offset=_fitness_offset(genes.nbytes))
+    return genes, fitness
+
+
+# Fitness vector starts on the next 8 byte boundary after the genes
+def _fitness_offset(genes_nbytes):
+    return (genes_nbytes + 7) // 8 * 8
+
+
+class ProcessPoolEvaluator(SerialEvaluator):
+    def __init__(self, workers=None):
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.shm = None
+
+    # Shared block big enough for the genes and the fitness vector, grown when needed
+    def _buffer(self, nbytes):
+        if self.shm is None or self.shm.size < nbytes:
+            from multiprocessing import shared_memory
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self.shm
+
+    def evaluate(self, genes, table_size, piece):
+        genes = np.ascontiguousarray(genes)
+        bounds = chunk_bounds(len(genes), self.workers)
+        if len(bounds) <= 1:
+            return batch_fitness(genes, table_size, piece)
+
+        shm = self._buffer(_fitness_offset(genes.nbytes) + len(genes) * np.dtype(np.int64).itemsize)
+        shared_genes, shared_fitness = _shared_views(shm, genes.shape, genes.dtype)
+        shared_genes[:] = genes
+        futures = [self.pool.submit(_evaluate_shared, shm.name, genes.shape, genes.dtype.str,
+                                    start, stop, table_size, piece) for start, stop in bounds]
+        for future in futures:
+            future.result()
+        fitness = shared_fitness.copy()
+        del shared_genes, shared_fitness
+        return fitness
+
+    def _release(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.pool.shutdown()
+        self._release()
+
+
+EVALUATORS = {'serial': SerialEvaluator,
+              'thread': ThreadPoolEvaluator,
+              'process': ProcessPoolEvaluator}
+
+
+# Builds an evaluator by name, workers is ignored by the serial evaluator
+def get_evaluator(name='serial', workers=None):
+    if name not in EVALUATORS:
+        raise ValueError("evaluator must be one of " + str(list(EVALUATORS)))
+    if name == 'serial':
+        return SerialEvaluator()
+    return EVALUATORS[name](workers)
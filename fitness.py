@@ -0,0 +1,83 @@
+import numpy as np
+from attacks import get_attack_model
+
+# Compiled kernel from nqueens.pyx, used when it has been built
+try:
+    import nqueens
+except ImportError:
+    nqueens = None
+
+"""
+Batch fitness engine, scores a whole population in one vectorized pass instead of calling
+count_safe_pieces on every individual.
+
+A piece is safe when no piece after it in the chromosome attacks it, the same rule used by
+count_safe_pieces. For every line a piece moves on (row, column, diagonal) we record the last
+chromosome index holding a piece on that line, a piece is attacked by a later one exactly when
+that last index is bigger than its own index. Knights do the same per square and look up the
+squares they attack in the knight attack table.
+
+When the nqueens extension is built batch_fitness hands the work to it, numpy_batch_fitness is
+always the NumPy version.
+"""
+
+# Upper bound of cells in the working tables per chunk, keeps memory flat for big boards
+CHUNK_CELLS = 1 << 22
+
+
+# Turns a list of [x, y] states into a pop x chromosome x 2 integer array
+def as_population_array(population):
+    population = np.asarray(population, dtype=np.int64)
+    return population.reshape(len(population), -1, 2)
+
+
+# For every individual the last chromosome index holding each key, -1 if the key is not used
+def last_occurrence(keys, num_keys):
+    pop, chrom = keys.shape
+    last = np.full((pop, num_keys), -1, dtype=np.int64)
+    rows = np.repeat(np.arange(pop), chrom)
+    np.maximum.at(last, (rows, keys.ravel()), np.tile(np.arange(chrom), pop))
+    return last
+
+
+# Marks the pieces attacked by a later piece, squares is a pop x chromosome array of square ids
+def batch_attacked(squares, model):
+    pop, chrom = squares.shape
+    rows = np.arange(pop)[:, None]
+    index = np.arange(chrom)[None, :]
+    if model.piece == 'bK':
+        # one extra column for the off-board sentinel, it is never occupied
+        last = last_occurrence(squares, model.num_squares + 1)
+        targets = model.targets[squares]
+        return (last[rows[:, :, None], targets] > index[:, :, None]).any(axis=2)
+
+    attacked = np.zeros((pop, chrom), dtype=bool)
+    for ids, num_lines in zip(model.line_ids, model.num_lines):
+        keys = ids[squares]
+        last = last_occurrence(keys, num_lines)
+        attacked |= last[rows, keys] > index
+    return attacked
+
+
+# Fitness of every individual in a pop x chromosome x 2 array, same scores as count_safe_pieces
+def batch_fitness(population, table_size, piece):
+    if nqueens is not None:
+        return nqueens.batch_fitness(np.ascontiguousarray(as_population_array(population)), table_size, piece)
+    return numpy_batch_fitness(population, table_size, piece)
+
+
+def numpy_batch_fitness(population, table_size, piece):
+    population = as_population_array(population)
+    pop, chrom = population.shape[0], population.shape[1]
+    fitness = np.zeros(pop, dtype=np.int64)
+    if pop == 0 or chrom == 0:
+        return fitness
+
+    model = get_attack_model(piece, table_size)
+    squares = population[:, :, 0] * table_size + population[:, :, 1]
+    width = model.num_squares + 1 if piece == 'bK' else 2 * table_size
+    chunk = max(1, CHUNK_CELLS // max(width, 9 * chrom))
+    for start in range(0, pop, chunk):
+        attacked = batch_attacked(squares[start:start + chunk], model)
+        fitness[start:start + chunk] = chrom - attacked.sum(axis=1)
+    return fitness
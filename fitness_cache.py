@@ -0,0 +1,159 @@
+from collections import OrderedDict
+import numpy as np
+from constants import *
+from evaluators import SerialEvaluator
+
+"""
+Fitness memoization. Crossover of a couple of parents makes many children that are copies of
+each other or of a parent, every one of them would be scored again.
+
+A state is keyed on its canonical form, the smallest byte string of the state under the board
+symmetries that keep the fitness, the chromosome order is kept since the fitness depends on it.
+
+    rooks, bishops, knights   all 8 rotations and reflections
+    queens                    the 4 that keep the columns (identity, both flips, half turn),
+                              piece_logic checks queens on columns and diagonals but not on rows
+                              so a transpose can change their fitness
+
+CachedEvaluator wraps any evaluator from evaluators.py, only the states missing from the LRU
+cache are sent to it and every distinct state is scored once per call. A state is looked up on
+its raw bytes first, copies of a parent are the usual hit and cost one dict lookup, the
+canonical key is only built for the states missing under their raw bytes. Both keys go in the
+same cache, a raw key that equals a canonical key is an image of that state so it has the same
+fitness.
+
+Scoring is cheap, a whole population is one NumPy pass, so the cache only pays off when about
+half of the offspring or more are copies (a low mutate_chance or few parents) and the piece is
+costly to score, knights most of all. With low hit rates, or for queens and rooks whose lines
+are scored fastest, a run is slower with the cache than without, leave cache_size at 0 there.
+"""
+
+# Default number of states kept in the cache
+CACHE_SIZE = 4096
+
+
+# (x, y) -> (x', y') maps for a board of table_size, m is the last coordinate
+def symmetries(piece):
+    maps = [lambda x, y, m: (x, y),
+            lambda x, y, m: (m - x, y),
+            lambda x, y, m: (x, m - y),
+            lambda x, y, m: (m - x, m - y)]
+    if piece != QUEEN:
+        maps += [lambda x, y, m: (y, x),
+                 lambda x, y, m: (m - y, x),
+                 lambda x, y, m: (y, m - x),
+                 lambda x, y, m: (m - y, m - x)]
+    return maps
+
+
+# Bytes of every individual in a pop x chromosome x 2 gene array
+def raw_keys(genes):
+    genes = np.ascontiguousarray(genes).reshape(len(genes), -1)
+    return genes.view(np.dtype((np.void, genes.dtype.itemsize * genes.shape[1]))).ravel().tolist()
+
+
+# Canonical key of every individual in a pop x chromosome x 2 gene array, the smallest raw key
+# of its images
+def canonical_keys(genes, table_size, piece):
+    genes = np.asarray(genes)
+    x, y = genes[..., 0], genes[..., 1]
+    m = table_size - 1
+    images = [raw_keys(np.stack(image(x, y, m), axis=-1).astype(genes.dtype)) for image in symmetries(piece)]
+    return [min(keys) for keys in zip(*images)]
+
+
+class FitnessCache:
+    def __init__(self, capacity=CACHE_SIZE):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self.entries), 'capacity': self.capacity, 'hit_rate': self.hit_rate}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CachedEvaluator(SerialEvaluator):
+    def __init__(self, evaluator=None, capacity=CACHE_SIZE):
+        self.evaluator = evaluator if evaluator is not None else SerialEvaluator()
+        self.cache = FitnessCache(capacity)
+
+    def evaluate(self, genes, table_size, piece):
+        genes = np.asarray(genes)
+        fitness = np.zeros(len(genes), dtype=np.int64)
+        # rows of every distinct raw key the cache does not know yet
+        unknown = {}
+        for i, key in enumerate(raw_keys(genes)):
+            if key in unknown:
+                # a copy of a state looked up in this call, counts as a hit
+                unknown[key].append(i)
+                self.cache.hits += 1
+                continue
+            cached = self.cache.entries.get(key)
+            if cached is None:
+                unknown[key] = [i]
+            else:
+                self.cache.entries.move_to_end(key)
+                self.cache.hits += 1
+                fitness[i] = cached
+        if not unknown:
+            return fitness
+
+        # the unknown states by canonical key, an image of a known state is not scored again
+        rows = [indices[0] for indices in unknown.values()]
+        missing = {}
+        for raw, key in zip(unknown, canonical_keys(genes[rows], table_size, piece)):
+            if key in missing:
+                self.cache.hits += 1
+                missing[key].append(raw)
+                continue
+            cached = self.cache.get(key)
+            if cached is None:
+                missing[key] = [raw]
+            else:
+                fitness[unknown[raw]] = cached
+                self.cache.put(raw, cached)
+
+        if missing:
+            scores = self.evaluator.evaluate(genes[[unknown[raws[0]][0] for raws in missing.values()]],
+                                             table_size, piece)
+            for (key, raws), score in zip(missing.items(), scores):
+                self.cache.put(key, int(score))
+                for raw in raws:
+                    fitness[unknown[raw]] = score
+                    self.cache.put(raw, int(score))
+        return fitness
+
+    def stats(self):
+        return self.cache.stats()
+
+    def close(self):
+        self.evaluator.close()
@@ -1,9 +1,24 @@
-from chess import *
-from other_tools import *
+from chess import count_safe_pieces, remove_attacking_pieces, print_board
 from constants import *
-import random
+from fitness import batch_fitness, as_population_array
+from conflicts import ConflictState
+from population import Population, gene_dtype, UNSCORED
+from selection import select, top_k
+from operators import order_cross_over, pmx_cross_over, swap_mutate, mutation_mask, CROSSOVERS, MUTATIONS
+from rng import make_rng
+from config import GAConfig, SolveResult
+from constructors import construct, STRATEGIES
+from local_search import repair
+from convergence import ConvergenceController, RESTART_FRACTION
+from fitness_cache import CachedEvaluator
+from profiling import GenerationProfiler
+from reporters import get_reporter
+from render import save_board, headless, BOARD_IMAGE
+from checkpoint import Checkpoint, CheckpointWriter, load_checkpoint
+from traces import TraceWriter
 import numpy as np
-# import time
+import os
+import time
 
 """
 Used the logic from this post 
@@ -21,29 +36,21 @@ and the Local Search Power Point.
 # [1, 4, 2, 3]
 
 # create a population with each parent having N chromosomes
-def create_population(pop_size, chrom_size, table_size, piece):
-    population = []
+#   note: rng is a seed or numpy Generator, every parent is drawn from it at once
+def create_population(pop_size, chrom_size, table_size, piece, rng=None):
+    rng = make_rng(rng)
+    genes = np.empty((pop_size, chrom_size, 2), dtype=gene_dtype(table_size))
     left_over = chrom_size - table_size
-    for i in range(0, pop_size):
-        if piece == 'bQ' or piece == 'bR':
-            parentx = list(range(table_size))
-            parenty = list(random.sample(range(0, table_size), table_size))
-        else:
-            parentx = list(random.sample(range(0, table_size), table_size))
-            parenty = list(random.sample(range(0, table_size), table_size))
-        if left_over != 0:
-            parentx += (list(random.choices(list(range(0, table_size)), k=left_over)))
-            parenty += (list(random.choices(list(range(0, table_size)), k=left_over)))
-
-        parent = []
-        for j in range(len(parentx)):
-            parent.append([parentx[j], parenty[j]])
+    columns = np.tile(np.arange(table_size), (pop_size, 1))
+    if piece == 'bQ' or piece == 'bR':
+        genes[:, :table_size, 0] = columns
+    else:
+        genes[:, :table_size, 0] = rng.permuted(columns, axis=1)
+    genes[:, :table_size, 1] = rng.permuted(columns, axis=1)
+    if left_over != 0:
+        genes[:, table_size:] = rng.integers(0, table_size, size=(pop_size, left_over, 2))
 
-        population.append(parent)
-    # for pop in population:
-    #    print(pop)
-
-    return population
+    return Population(genes, table_size, piece)
 
 
 # [3, 1, 4, 2] Score 1
@@ -55,10 +62,20 @@ def create_population(pop_size, chrom_size, table_size, piece):
 # [1, 4, 2, 3] Score n
 
 # calculating the fitness score for all the current parents in the population
-def cal_pop_fitness(population, table_size):
+#   note: batch scores the whole population in one vectorized pass, set it to False
+#   to fall back to calling count_safe_pieces on every parent. A Population keeps its
+#   fitness vector, only the individuals without one are scored. evaluator picks the
+#   serial, thread or process pool backend from evaluators.py
+def cal_pop_fitness(population, table_size, piece=PIECE, batch=True, evaluator=None):
+    if isinstance(population, Population) and batch:
+        return population.evaluate(evaluator)
+    if batch and evaluator is not None:
+        return evaluator.evaluate(as_population_array(population), table_size, piece).tolist()
+    if batch:
+        return batch_fitness(population, table_size, piece).tolist()
     fitness = []
     for parent in population:
-        fitness.append(count_safe_pieces(parent, table_size, PIECE))
+        fitness.append(count_safe_pieces(parent, table_size, piece))
     return fitness
 
 
@@ -75,20 +92,16 @@ def select_best(population, fitness, num_parents=1):
         print("The number of parents must be smaller or equal to the population size")
         quit()
 
-    parents = []
-    temp_fitness = fitness.copy()
+    # find N number of best parents in one pass, return their indices within the population
+    indices, _ = top_k(fitness, num_parents)
+    return gather(population, indices)
 
-    # find N number of best parents, return their indices within the population
-    for i in range(num_parents):
-        # find current max value
-        max_value = max(temp_fitness)
-        # find its index in original fitness list and save it
-        max_index = temp_fitness.index(max_value)
-        parents.append(population[max_index])
-        # remove the max value from tmp list to find the next largest fitness score
-        temp_fitness[max_index] = -1
 
-    return parents
+# the individuals at indices, copied out of a Population or picked from a list
+def gather(population, indices):
+    if isinstance(population, Population):
+        return population.take(indices)
+    return [population[i] for i in indices]
 
 
 # [3, 1, 4, 2] parent 1
@@ -103,26 +116,34 @@ def select_best(population, fitness, num_parents=1):
 # [x, x, x, x] child n
 
 
-# Cross over two random parents with random combination
-def cross_over(parents, num_offspring):
-    children = []
-
-    # If parent
-    if len(parents[0]) == 1 or len(parents) == 1:
-        children.append(list([0, 0]))
-        return children
-
-    for i in range(num_offspring):
-        # Select two random parent indices
-        rand_idx1 = np.random.randint(1, len(parents))
-        rand_idx2 = np.random.randint(1, len(parents))
-        # Select an index to spilt the parent
-        c = np.random.randint(1, len(parents[0]))
-        # Append the two parents lists based off c index
-        child = parents[rand_idx1][0:c] + parents[rand_idx2][c:]
-        children.append(child)
-
-    return children
+# Cross over two random parents with random combination, the children are written
+# into a new array so they never share genes with their parents
+#   note: all the parent indices and cut points come from one RNG call each and the
+#   children are spliced with a single masked gather. 'pmx' and 'order' keep the y values
+#   a permutation, they only work for queens and rooks
+def cross_over(parents, num_offspring, method='one_point', rng=None):
+    if method not in CROSSOVERS:
+        raise ValueError("crossover must be one of " + str(CROSSOVERS))
+    rng = make_rng(rng)
+    if method == 'pmx':
+        return pmx_cross_over(parents, num_offspring, rng)
+    if method == 'order':
+        return order_cross_over(parents, num_offspring, rng)
+
+    # If there is nothing to combine the children are copies of the first parent
+    if parents.chromosome_size == 1 or len(parents) == 1:
+        children = np.repeat(parents.genes[:1], num_offspring, axis=0)
+        return Population(children, parents.table_size, parents.piece)
+
+    # Select two random parent indices for every child
+    rand_idx = rng.integers(1, len(parents), size=(num_offspring, 2))
+    # Select an index to spilt the parents of every child
+    c = rng.integers(1, parents.chromosome_size, size=num_offspring)
+    # Take the genes before c from the first parent and the rest from the second
+    from_first = np.arange(parents.chromosome_size)[None, :] < c[:, None]
+    children = np.where(from_first[:, :, None], parents.genes[rand_idx[:, 0]], parents.genes[rand_idx[:, 1]])
+
+    return Population(children, parents.table_size, parents.piece)
 
 
 # [3, 1, 3*, 4] child 1 => [3, 1, 2, 4]
@@ -136,88 +157,295 @@ def cross_over(parents, num_offspring):
 
 # Given a mutation probability and a some children
 # randomly mutate a chromosome with a random valid chromosome
-def mutate(children, mutate_chance, piece, table_size):
-    # If mutation probability is met mutate children
-    if random.random() <= mutate_chance:
-        # Select a random start and end indices to mutate
+#   note: genes random genes per child are mutated in a single masked assignment, per_child
+#   rolls the mutation chance for every child instead of once for the whole batch.
+#   'swap' exchanges the y of two genes so queen and rook permutations are kept
+def mutate(children, mutate_chance, piece, table_size, method='reset', per_child=False, rng=None, genes=1):
+    if method not in MUTATIONS:
+        raise ValueError("mutation must be one of " + str(MUTATIONS))
+    rng = make_rng(rng)
+    if method == 'swap':
+        return swap_mutate(children, mutate_chance, per_child, rng, genes)
+
+    # children the mutation probability was met for
+    rows = np.nonzero(mutation_mask(len(children), mutate_chance, per_child, rng))[0]
+    if len(rows) == 0:
+        return children
+    # Select random child xy indices
+    rand_xy_idx = rng.integers(0, children.chromosome_size, size=(len(rows), genes))
+    # mutate the selected child xy indices
+    #   note: if Queen or Rook we don't change the x value,
+    #   just the y index
+    if piece != 'bQ' and piece != 'bR':
+        children.genes[rows[:, None], rand_xy_idx, 0] = rng.integers(0, table_size, size=(len(rows), genes))
+    children.genes[rows[:, None], rand_xy_idx, 1] = rng.integers(0, table_size, size=(len(rows), genes))
+    children.fitness = None
+    return children
+
+
+# Same as cross_over but splices ConflictState parents, the children keep their cached
+# conflict counters so their fitness doesn't have to be recomputed
+def cross_over_incremental(parents, num_offspring, rng=None):
+    rng = make_rng(rng)
+    children = []
+
+    # If there is nothing to combine the children are copies of the first parent
+    if len(parents[0]) == 1 or len(parents) == 1:
+        return [parents[0].copy() for _ in range(num_offspring)]
+
+    for i in range(num_offspring):
+        rand_idx1, rand_idx2 = rng.integers(1, len(parents), size=2)
+        c = rng.integers(1, len(parents[0]))
+        children.append(parents[rand_idx1].splice(parents[rand_idx2], c))
+
+    return children
+
+
+# Same as mutate but moves the gene through ConflictState.move, which updates the fitness
+# by only rechecking the pieces sharing a line or square with the old and new positions
+def mutate_incremental(children, mutate_chance, piece, table_size, rng=None, genes=1):
+    rng = make_rng(rng)
+    if rng.random() <= mutate_chance:
         for child in children:
-            # Select a random child xy index
-            rand_xy_idx = random.randint(0, len(child) - 1)
-            # Select random y index
-            rand_y = random.randint(0, table_size - 1)
-            # mutate the selected child xy index
-            #   note: if Queen or Rook we don't change the x value,
-            #   just the y index
-            if piece != 'bQ' and piece != 'bR':
-                rand_x = random.randint(0, table_size - 1)
-                child[rand_xy_idx][0] = rand_x
-            child[rand_xy_idx][1] = rand_y
-            # print(children[i])
+            for _ in range(genes):
+                rand_xy_idx = int(rng.integers(0, len(child)))
+                rand_y = int(rng.integers(0, table_size))
+                rand_x = child[rand_xy_idx][0]
+                if piece != 'bQ' and piece != 'bR':
+                    rand_x = int(rng.integers(0, table_size))
+                child.move(rand_xy_idx, rand_x, rand_y)
     return children
 
 
-def genetic_algorithm():
-    new_population = create_population(INIT_SIZE, CHROMOSOME_MAX[PIECE], TABLE_SIZE, PIECE)
+# Runs the GA for one configuration and returns a SolveResult
+#   note: evaluator scores the population (see evaluators.py), hooks get one record per
+#   generation (see profiling.py) and reporter the progress, by default the one config.reporter
+#   names. Everything else is read from config, each option is described in the module it turns on
+def solve(config=None, evaluator=None, hooks=None, reporter=None):
+    config = config if config is not None else GAConfig()
+    if config.strategy not in STRATEGIES:
+        raise ValueError("strategy must be one of " + str(STRATEGIES))
+    # checked again by cross_over and mutate, here a typo fails before the first generation
+    if config.crossover not in CROSSOVERS:
+        raise ValueError("crossover must be one of " + str(CROSSOVERS))
+    if config.mutation not in MUTATIONS:
+        raise ValueError("mutation must be one of " + str(MUTATIONS))
+    if config.incremental:
+        # options the ConflictState operators don't have, see conflicts.py
+        unsupported = [name for name, unset in [('crossover', config.crossover == 'one_point'),
+                                                ('mutation', config.mutation == 'reset'),
+                                                ('cache_size', config.cache_size == 0),
+                                                ('adaptive', not config.adaptive)] if not unset]
+        if unsupported:
+            raise ValueError("incremental can't be combined with " + ', '.join(unsupported))
+    table_size, piece = config.table_size, config.piece
+    target = config.chromosome_max
+    tic = time.perf_counter()
+
+    constructed = None
+    if config.strategy != 'ga':
+        # construct checks the placement with count_safe_pieces
+        constructed = construct(table_size, piece)
+    if constructed is not None and config.strategy == 'analytic':
+        total = time.perf_counter() - tic
+        return SolveResult(constructed, target, 0, 1, {'total': total, 'per_generation': 0.0}, config, 'analytic',
+                           'solved')
+
+    rng = make_rng(config.seed)
+    resumed = None
+    if config.resume and config.checkpoint_path is not None and os.path.exists(config.checkpoint_path):
+        resumed = load_checkpoint(config.checkpoint_path)
+        if (resumed.table_size, resumed.piece) != (table_size, piece):
+            raise ValueError("checkpoint is for a " + str(resumed.table_size) + " board of " + str(resumed.piece))
+        rng.bit_generator.state = resumed.rng_state
+        new_population = Population(resumed.genes, table_size, piece, resumed.fitness)
+    else:
+        new_population = create_population(config.init_size, target, table_size, piece, rng)
+        if constructed is not None:
+            new_population.genes[0] = constructed
+    if config.incremental:
+        new_population = [ConflictState(state, table_size, piece) for state in new_population.tolist()]
 
     best_result = -1
     best_state = []
-
-    for generation in range(NUM_GENERATIONS):
+    evaluations = 0
+    generation = 0
+    stop_reason = 'generations'
+    controller = ConvergenceController(config.mutate_chance, config.adaptive, config.stall_limit, config.time_budget)
+    start = 0
+    if resumed is not None:
+        best_result = resumed.best_result
+        best_state = resumed.best_state
+        if config.incremental:
+            best_state = ConflictState(best_state.tolist(), table_size, piece)
+        evaluations = resumed.evaluations
+        start = resumed.generation
+        generation = max(start - 1, 0)
+        controller.restore(resumed.controller)
+    writer = CheckpointWriter(config.checkpoint_path) if config.checkpoint_path is not None else None
+    cached = None
+    if config.cache_size > 0:
+        cached = evaluator = CachedEvaluator(evaluator, config.cache_size)
+    # a resumed run continues the trace and report of the checkpointed one
+    resume_generation = resumed.generation if resumed is not None else None
+    tracer = None
+    if config.trace_path is not None:
+        tracer = TraceWriter(config.trace_path, resume_generation=resume_generation)
+        hooks = list(hooks or []) + [tracer]
+    profiler = GenerationProfiler(hooks)
+    if reporter is None:
+        reporter = get_reporter(config.reporter if config.verbose else 'silent', config.report_every,
+                                config.report_interval, config.report_path, resume_generation=resume_generation)
+
+    for generation in range(start, config.num_generations):
+        profiler.start()
 
         # Find the fitness for each chromosome in the population
-        fitness = cal_pop_fitness(new_population, TABLE_SIZE)  # Time 0.025
-
-        # Select the best parents in the population for mating
-        parents = select_best(new_population, fitness, NUM_PARENTS)  # Time 0.00
-
-        # The best result in the current population ---- Time 0.001 ----
-        curr_states = select_best(new_population, fitness)
-        curr_result = count_safe_pieces(curr_states[0], TABLE_SIZE, PIECE)
-        curr_best_state = curr_states[0]
+        if config.incremental:
+            fitness = [state.fitness for state in new_population]
+        else:
+            fitness = cal_pop_fitness(new_population, table_size, piece, evaluator=evaluator)
+        evaluations += len(new_population)
+        profiler.lap('fitness')
+
+        # Select the parents in the population for mating and the best result in the
+        # current population in the same pass
+        parent_indices, best_index = select(fitness, config.num_parents, config.selection,
+                                            config.tournament_size, rng)
+        parents = gather(new_population, parent_indices)
+        curr_result = int(fitness[best_index])
+        curr_best_state = new_population[best_index]
+        profiler.lap('selection')
+
+        # Memetic mode, repair the parents with a bounded min conflicts search
+        if config.memetic_steps > 0:
+            parents_fitness = repair(parents, config.memetic_steps, rng)
+            top = int(np.argmax(parents_fitness))
+            if parents_fitness[top] > curr_result:
+                curr_result = int(parents_fitness[top])
+                curr_best_state = parents[top]
+            profiler.lap('repair')
         if best_result < curr_result:
-            # print("Current result " + str(curr_result))
-            # print("current_sate[0]= " + str(curr_states[0]))
             best_result = curr_result
             best_state = curr_best_state
+        profiler.observe(generation, fitness, new_population, evaluations, best_result, best_state,
+                         controller.mutate_chance)
 
         # Fancy printing of generation number
-        print(make_ordinal(generation + 1) + ' Generation best result is ' + str(best_result))
+        reporter.report(generation, best_result)
         # exit loop if best result is equal to size of board
-        if best_result == CHROMOSOME_MAX[PIECE]:
+        if best_result == target:
             best_state = curr_best_state
+            stop_reason = 'solved'
+        else:
+            # Track the convergence, stop on a stall or when the time budget is used up
+            restart = controller.update(best_result, new_population)
+            if controller.should_stop:
+                stop_reason = controller.stop_reason
+        if stop_reason != 'generations':
+            profiler.end_generation()
             break
+        profiler.start()
+
+        # Generate the crossover and add variation using random mutation
+        #   note: in adaptive mode every child rolls the controller's mutation chance on its own
+        #   and a stalled run mutates more genes per child
+        if config.incremental:
+            offspring = cross_over_incremental(parents, config.pop_size, rng)
+            profiler.lap('crossover')
+            offspring_mutation = mutate_incremental(offspring, controller.mutate_chance, piece, table_size, rng=rng,
+                                                    genes=controller.mutate_genes)
+        else:
+            offspring = cross_over(parents, config.pop_size, config.crossover, rng)
+            profiler.lap('crossover')
+            offspring_mutation = mutate(offspring, controller.mutate_chance, piece, table_size, config.mutation,
+                                        per_child=config.adaptive, rng=rng, genes=controller.mutate_genes)
+        profiler.lap('mutation')
 
-        # Generate the crossover
-        offspring = cross_over(parents, POP_SIZE)  # Time 0.001
-
-        # Adding variation using random mutation
-        offspring_mutation = mutate(offspring, MUTATE_CHANCE, PIECE, TABLE_SIZE)  # Time 0.0001
-
-        # # Creating new population based on a random number of surviving parents and their offspring
-        # # Surviving parents
-        # # ----- Total Time 0.03 -----
-        # number_surviving = np.random.randint(1, len(parents))
-        # # Calculate the fitness score of the best parents
-        # parents_fitness = cal_pop_fitness(parents, TABLE_SIZE)
-        # # Get the best surviving parents
-        # best_parents = select_best(parents, parents_fitness, number_surviving)
         # Delete old population and replace it with best parents and
         # the offspring
-        # ---- Total Time 0.001 ----
-        new_population[0:] = parents
-        new_population += offspring_mutation
-
-    print("Best solution is state : ", best_state)
-    print("Best solution fitness : ", best_result)
-    best_state = remove_attacking_pieces(best_state, TABLE_SIZE, PIECE)
-    print_board(best_state)
-
-
-# # Use this to test the speed od functions
-# # starting time
-# start = time.time()
-# # end time
-# end = time.time()
-# # total time taken
-# print(f"Runtime of the program is {end - start}")
+        if config.incremental:
+            new_population = parents + offspring_mutation
+        else:
+            new_population = parents.concat(offspring_mutation)
+
+        # Replace part of the offspring with new random individuals when the run stagnates
+        if restart:
+            new_population = restart_population(new_population, len(parents), config, rng)
+        profiler.lap('replace')
+        profiler.end_generation()
+
+        # The copies are taken here, the writer thread compresses and writes them
+        if writer is not None and (generation + 1) % config.checkpoint_every == 0:
+            writer.submit(make_checkpoint(new_population, best_state, generation + 1, best_result,
+                                          evaluations, rng, controller, config))
+
+    if writer is not None:
+        # a run that used up its generations can be resumed with more of them
+        if stop_reason == 'generations' and generation + 1 > start:
+            writer.submit(make_checkpoint(new_population, best_state, generation + 1, best_result,
+                                          evaluations, rng, controller, config))
+        writer.close()
+    if tracer is not None:
+        tracer.close()
+    reporter.finish(generation, best_result, stop_reason)
+    if config.incremental:
+        best_state = best_state.state
+    else:
+        best_state = best_state.tolist()
+    total = time.perf_counter() - tic
+    timings = {'total': total, 'per_generation': total / (generation + 1), 'stages': profiler.totals}
+    strategy = 'seeded' if constructed is not None else 'ga'
+    result = SolveResult(best_state, best_result, generation + 1, evaluations, timings, config, strategy,
+                         stop_reason)
+    result.cache = cached.stats() if cached is not None else None
+    return result
+
+
+# Snapshot of the run before generation is scored, see checkpoint.py
+def make_checkpoint(population, best_state, generation, best_result, evaluations, rng, controller, config):
+    dtype = gene_dtype(config.table_size)
+    if config.incremental:
+        genes = np.array([state.state for state in population], dtype=dtype)
+        fitness = np.array([state.fitness for state in population], dtype=np.int64)
+        best_state = best_state.state
+    else:
+        genes = population.genes.copy()
+        fitness = population.known_fitness().copy()
+    return Checkpoint(genes, fitness, np.array(best_state, dtype=dtype), generation,
+                      int(best_result), evaluations, rng.bit_generator.state, controller.snapshot(),
+                      config.table_size, config.piece)
+
+
+# Replaces a RESTART_FRACTION of the individuals after the first keep ones with new random ones
+def restart_population(population, keep, config, rng):
+    count = min(int(len(population) * RESTART_FRACTION), len(population) - keep)
+    if count <= 0:
+        return population
+    fresh = create_population(count, config.chromosome_max, config.table_size, config.piece, rng)
+    if config.incremental:
+        fresh = [ConflictState(state, config.table_size, config.piece) for state in fresh.tolist()]
+        return population[:len(population) - count] + fresh
+    population.genes[-count:] = fresh.genes
+    if population.fitness is not None:
+        population.fitness[-count:] = UNSCORED
+    return population
+
+
+# Solves the configuration, prints the result and writes the board to image_path without
+#   opening a window, show=True opens one and waits until it is closed
+def genetic_algorithm(config=None, evaluator=None, hooks=None, image_path=BOARD_IMAGE, show=False):
+    config = config if config is not None else GAConfig()
+    result = solve(config, evaluator, hooks)
+    print("Best solution found by : ", result.strategy)
+    print("Best solution is state : ", result.best_state)
+    print("Best solution fitness : ", result.best_result)
+    best_state = remove_attacking_pieces(result.best_state, config.table_size, config.piece)
+    if not show:
+        headless()
+    if image_path is not None:
+        print("Board written to : ", save_board(best_state, config, image_path))
+    if show:
+        print_board(best_state, config)
+    return result
 
@@ -0,0 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+import multiprocessing as mp
+import time
+import numpy as np
+from ga import create_population, cal_pop_fitness, select_best, gather, cross_over, mutate
+from population import gene_dtype
+from selection import select
+from rng import spawn_seeds
+from config import GAConfig
+
+"""
+Island model GA, N independent populations evolve in a process pool.
+
+Every migration_interval generations each island copies its best migration_size individuals into
+a shared memory buffer, waits for the other islands, then replaces its newest children with the
+migrants of its neighbours. The ring topology takes migrants from the previous island, the full
+topology from every other island. As soon as one island finds a perfect state it raises the done
+flag and breaks the barrier so every island stops.
+"""
+
+TOPOLOGIES = ['ring', 'full']
+
+# Worker side state, filled once per process by _init_island
+_shared = {}
+
+
+# Islands an island takes migrants from
+def migration_sources(island, num_islands, topology):
+    if num_islands == 1:
+        return []
+    if topology == 'ring':
+        return [(island - 1) % num_islands]
+    return [j for j in range(num_islands) if j != island]
+
+
+def _init_island(shm_name, shape, dtype, barrier, done):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _shared['shm'] = shm
+    _shared['migrants'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _shared['barrier'] = barrier
+    _shared['done'] = done
+
+
+# Evolves one island, returns its best fitness, state and the number of generations it ran
+def _run_island(island, seed, config, settings):
+    rng = np.random.default_rng(seed)
+    table_size, piece = config.table_size, config.piece
+    target = config.chromosome_max
+    migrants, barrier, done = _shared['migrants'], _shared['barrier'], _shared['done']
+    sources = migration_sources(island, settings['num_islands'], settings['topology'])
+    migration_size = settings['migration_size']
+
+    population = create_population(config.init_size, target, table_size, piece, rng)
+    best_result = -1
+    best_state = []
+    generation = 0
+
+    for generation in range(config.num_generations):
+        if done.value:
+            break
+        fitness = cal_pop_fitness(population, table_size, piece)
+        best = int(np.argmax(fitness))
+        if fitness[best] > best_result:
+            best_result = int(fitness[best])
+            best_state = population[best].tolist()
+        if best_result == target:
+            done.value = 1
+            barrier.abort()
+            break
+
+        parent_indices, _ = select(fitness, config.num_parents, config.selection, config.tournament_size, rng)
+        parents = gather(population, parent_indices)
+
+        incoming = None
+        if sources and (generation + 1) % settings['migration_interval'] == 0:
+            migrants[island] = select_best(population, fitness, migration_size).genes
+            try:
+                barrier.wait()
+                incoming = migrants[sources].reshape(-1, target, 2).copy()
+                barrier.wait()
+            except BrokenBarrierError:
+                break
+
+        offspring = cross_over(parents, config.pop_size, config.crossover, rng)
+        offspring = mutate(offspring, config.mutate_chance, piece, table_size, config.mutation, rng=rng)
+        if incoming is not None:
+            # the migrants take the place of the newest children
+            count = min(len(incoming), len(offspring))
+            offspring.genes[-count:] = incoming[:count]
+        population = parents.concat(offspring)
+
+    return island, best_result, best_state, generation + 1
+
+
+# Runs the island model for config and returns the best island result with the wall clock time
+def island_model(config=None, num_islands=4, migration_interval=10, migration_size=2, topology='ring'):
+    if topology not in TOPOLOGIES:
+        raise ValueError("topology must be one of " + str(TOPOLOGIES))
+    config = config if config is not None else GAConfig()
+    chromosome_max = config.chromosome_max
+    # every island gets its own stream spawned from the one seed
+    seeds = spawn_seeds(config.seed, num_islands)
+    migration_size = min(migration_size, config.init_size, config.num_parents + config.pop_size)
+
+    settings = {'num_islands': num_islands, 'migration_interval': migration_interval,
+                'migration_size': migration_size, 'topology': topology}
+
+    dtype = np.dtype(gene_dtype(config.table_size))
+    shape = (num_islands, migration_size, chromosome_max, 2)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    context = mp.get_context()
+    barrier = context.Barrier(num_islands)
+    done = context.Value('b', 0)
+
+    tic = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=num_islands, mp_context=context, initializer=_init_island,
+                                 initargs=(shm.name, shape, dtype, barrier, done)) as pool:
+            futures = [pool.submit(_run_island, i, seeds[i], config, settings) for i in range(num_islands)]
+            results = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+    toc = time.perf_counter()
+
+    island, best_result, best_state, generations = max(results, key=lambda result: result[1])
+    return {'island': island, 'best_result': best_result, 'best_state': best_state,
+            'generations': generations, 'solved': best_result == chromosome_max,
+            'wall_time': toc - tic, 'num_islands': num_islands}
+
+
+# Runs the same problem on one island and on num_islands islands and reports the speedup
+def island_speedup(config=None, num_islands=4, **kwargs):
+    single = island_model(config, num_islands=1, **kwargs)
+    multi = island_model(config, num_islands=num_islands, **kwargs)
+    speedup = single['wall_time'] / multi['wall_time'] if multi['wall_time'] > 0 else float('inf')
+    print("1 island     : " + str(round(single['wall_time'], 3)) + "s, best " + str(single['best_result']))
+    print(str(num_islands) + " islands    : " + str(round(multi['wall_time'], 3)) + "s, best "
+          + str(multi['best_result']))
+    print("Speedup      : " + str(round(speedup, 2)) + "x")
+    return single, multi, speedup
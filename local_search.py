@@ -0,0 +1,69 @@
+from conflicts import ConflictState
+from population import Population
+
+"""
+Min conflicts repair for the memetic GA. Every step takes an attacked piece and moves it to the
+square where it conflicts with the fewest other pieces, the conflict counts come straight from
+the ConflictState buckets so each candidate square costs O(1). Moves that lower the fitness are
+undone, so a repaired individual is never worse than before.
+
+Queens and rooks only move along their column (x stays put, like mutate), bishops and knights
+try table_size random squares per step.
+"""
+
+# Random picks tried before scanning the whole state for an attacked piece
+PICK_TRIES = 8
+
+
+# Index of a random attacked piece, None when every piece is safe
+def _pick_attacked(state, rng):
+    for _ in range(PICK_TRIES):
+        index = int(rng.integers(0, len(state)))
+        if state.attacked[index]:
+            return index
+    attacked = [index for index, flag in enumerate(state.attacked) if flag]
+    if not attacked:
+        return None
+    return attacked[int(rng.integers(0, len(attacked)))]
+
+
+# Runs up to steps min conflicts moves on a ConflictState, returns its fitness
+def min_conflicts(state, steps, rng):
+    table_size = state.table_size
+    for _ in range(steps):
+        index = _pick_attacked(state, rng)
+        if index is None:
+            break
+        x, y = state[index]
+        if state.piece == 'bQ' or state.piece == 'bR':
+            candidates = [(x, new_y) for new_y in range(table_size)]
+        else:
+            squares = rng.integers(0, table_size, size=(table_size, 2)).tolist()
+            candidates = [(x, y)] + [(new_x, new_y) for new_x, new_y in squares]
+
+        scores = [state.conflicts_at(state.model.square(cx, cy), index) for cx, cy in candidates]
+        least = min(scores)
+        ties = [candidate for candidate, score in zip(candidates, scores) if score == least]
+        new_x, new_y = ties[int(rng.integers(0, len(ties)))]
+
+        before = state.fitness
+        state.move(index, new_x, new_y)
+        if state.fitness < before:
+            state.move(index, x, y)
+    return state.fitness
+
+
+# Repairs every individual of parents in place with steps min conflicts moves each,
+# parents is a Population or a list of ConflictState, returns the new fitness of every parent
+def repair(parents, steps, rng):
+    if not isinstance(parents, Population):
+        return [min_conflicts(state, steps, rng) for state in parents]
+
+    fitness = []
+    for i in range(len(parents)):
+        state = ConflictState(parents.genes[i].tolist(), parents.table_size, parents.piece)
+        fitness.append(min_conflicts(state, steps, rng))
+        parents.genes[i] = state.state
+    if parents.fitness is not None:
+        parents.fitness[:] = fitness
+    return fitness
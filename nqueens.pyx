@@ -0,0 +1,125 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+import numpy as np
+
+"""
+Compiled fitness kernel, build it with
+
+    python setup.py build_ext --inplace
+
+Same scores as chess.count_safe_pieces: a piece is safe when no piece after it in the state
+attacks it. Pieces are walked from the last to the first while marking the lines (or squares
+for knights) already taken by a later piece, so every state costs O(chromosome).
+fitness.py and chess.py fall back to the NumPy and Python versions when this isn't built.
+
+There are no bounds checks, genes off the board (like the -1 of removed pieces) are skipped and
+never counted as safe, chess.count_safe_pieces sends states holding them to the Python path.
+"""
+
+cdef int QUEEN = 0
+cdef int BISHOP = 1
+cdef int ROOK = 2
+cdef int KNIGHT = 3
+
+cdef int[9] KNIGHT_DX = [0, 2, -2, 2, -2, 1, -1, 1, -1]
+cdef int[9] KNIGHT_DY = [0, -1, -1, 1, 1, 2, 2, -2, -2]
+
+
+cdef int piece_code(str piece) except -1:
+    if piece == 'bQ':
+        return QUEEN
+    if piece == 'bB':
+        return BISHOP
+    if piece == 'bR':
+        return ROOK
+    if piece == 'bK':
+        return KNIGHT
+    raise ValueError("unknown piece " + piece)
+
+
+# Checks if the piece on (x1, y1) and the piece on (x2, y2) attack each other
+cpdef bint attacks(long long x1, long long y1, long long x2, long long y2, str piece):
+    cdef int code = piece_code(piece)
+    cdef long long dx = x1 - x2 if x1 > x2 else x2 - x1
+    cdef long long dy = y1 - y2 if y1 > y2 else y2 - y1
+    if code == QUEEN:
+        return y1 == y2 or dx == dy
+    if code == BISHOP:
+        return dx == dy
+    if code == ROOK:
+        return x1 == x2 or y1 == y2
+    return (dx == 0 and dy == 0) or (dx == 2 and dy == 1) or (dx == 1 and dy == 2)
+
+
+# Safe pieces of one state, seen[line] == stamp means a later piece is on that line
+cdef long long count_state(const long long[:, :] state, int table_size, int code,
+                           long long[:] seen, long long stamp) nogil:
+    cdef Py_ssize_t i, k
+    cdef long long x, y, nx, ny
+    cdef long long chrom = state.shape[0]
+    cdef long long safe = 0
+    cdef long long lines = 2 * table_size - 1
+    cdef bint attacked
+    # line offsets into seen: columns, rows, diagonals, anti diagonals
+    cdef long long columns = 0
+    cdef long long rows = table_size
+    cdef long long diagonals = 2 * table_size
+    cdef long long anti_diagonals = 2 * table_size + lines
+
+    for i in range(chrom - 1, -1, -1):
+        x = state[i, 0]
+        y = state[i, 1]
+        if x < 0 or x >= table_size or y < 0 or y >= table_size:
+            continue
+        attacked = False
+        if code == KNIGHT:
+            for k in range(9):
+                nx = x + KNIGHT_DX[k]
+                ny = y + KNIGHT_DY[k]
+                if 0 <= nx < table_size and 0 <= ny < table_size and seen[nx * table_size + ny] == stamp:
+                    attacked = True
+                    break
+            seen[x * table_size + y] = stamp
+        else:
+            if code != ROOK:
+                if seen[diagonals + x - y + table_size - 1] == stamp:
+                    attacked = True
+                if seen[anti_diagonals + x + y] == stamp:
+                    attacked = True
+                seen[diagonals + x - y + table_size - 1] = stamp
+                seen[anti_diagonals + x + y] = stamp
+            if code != BISHOP:
+                if seen[columns + y] == stamp:
+                    attacked = True
+                seen[columns + y] = stamp
+            if code == ROOK:
+                if seen[rows + x] == stamp:
+                    attacked = True
+                seen[rows + x] = stamp
+        if not attacked:
+            safe += 1
+    return safe
+
+
+cdef long long[:] new_seen(int table_size):
+    cdef long long size = max(table_size * table_size, 6 * table_size)
+    return np.zeros(size, dtype=np.int64)
+
+
+# Check if piece is attacking another piece, state is a chromosome x 2 int64 array
+def count_safe_pieces(const long long[:, :] state, int table_size, str piece):
+    cdef int code = piece_code(piece)
+    cdef long long[:] seen = new_seen(table_size)
+    return count_state(state, table_size, code, seen, 1)
+
+
+# Fitness of every individual in a pop x chromosome x 2 int64 array
+def batch_fitness(const long long[:, :, :] population, int table_size, str piece):
+    cdef int code = piece_code(piece)
+    cdef long long[:] seen = new_seen(table_size)
+    result = np.zeros(population.shape[0], dtype=np.int64)
+    cdef long long[:] fitness = result
+    cdef Py_ssize_t p
+    with nogil:
+        for p in range(population.shape[0]):
+            fitness[p] = count_state(population[p], table_size, code, seen, p + 1)
+    return result
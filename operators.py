@@ -0,0 +1,108 @@
+import numpy as np
+from population import Population
+from rng import make_rng
+
+"""
+Permutation preserving operators for queens and rooks.
+
+create_population gives queens and rooks x = range(table_size) and a permutation of y, so every
+column holds exactly one piece. One point crossover and random y mutation break the permutation,
+these operators keep it: PMX and order crossover build children that are still permutations of y
+and swap mutation exchanges the y of two genes.
+"""
+
+PERMUTATION_PIECES = ['bQ', 'bR']
+# Names cross_over and mutate in ga.py take, one point crossover and reset mutation live there
+CROSSOVERS = ['one_point', 'order', 'pmx']
+MUTATIONS = ['reset', 'swap']
+
+
+def _check_permutation(parents):
+    if parents.piece not in PERMUTATION_PIECES or parents.chromosome_size != parents.table_size:
+        raise ValueError("permutation operators need a queen or rook population with one gene per column")
+
+
+# Random parent pairs and the [start, stop) segment copied from the first parent, one RNG call each
+def _draw_segments(parents, num_offspring, rng):
+    pairs = rng.integers(0, len(parents), size=(num_offspring, 2))
+    bounds = np.sort(rng.integers(0, parents.chromosome_size + 1, size=(num_offspring, 2)), axis=1)
+    return pairs, bounds[:, 0], bounds[:, 1]
+
+
+# Order crossover, the child keeps the segment of the first parent and the other
+# positions, starting after the segment, get the missing values in the order of the second parent
+def order_cross_over(parents, num_offspring, rng=None):
+    _check_permutation(parents)
+    pairs, start, stop = _draw_segments(parents, num_offspring, make_rng(rng))
+    size = parents.chromosome_size
+    y1 = parents.genes[pairs[:, 0], :, 1]
+    y2 = parents.genes[pairs[:, 1], :, 1]
+    positions = np.arange(size)[None, :]
+    in_segment = (positions >= start[:, None]) & (positions < stop[:, None])
+
+    # values the segment already holds, as a num_offspring x table_size lookup
+    rows = np.arange(num_offspring)[:, None]
+    taken = np.zeros((num_offspring, parents.table_size), dtype=bool)
+    taken[rows, y1] = in_segment
+
+    # walk the second parent and the child positions from the end of the segment around
+    rotated = (positions + stop[:, None]) % size
+    y2_rotated = np.take_along_axis(y2, rotated, axis=1)
+    keep = ~taken[rows, y2_rotated]
+    free = ~np.take_along_axis(in_segment, rotated, axis=1)
+
+    children = parents.genes[pairs[:, 0]].copy()
+    # every row keeps as many values as it has free positions, so the row major order lines up
+    fill_rows = np.broadcast_to(rows, rotated.shape)[free]
+    children[fill_rows, rotated[free], 1] = y2_rotated[keep]
+    return Population(children, parents.table_size, parents.piece)
+
+
+# Partially mapped crossover, the child keeps the segment of the first parent and takes the rest
+# from the second parent, values clashing with the segment are followed through the mapping
+def pmx_cross_over(parents, num_offspring, rng=None):
+    _check_permutation(parents)
+    pairs, start, stop = _draw_segments(parents, num_offspring, make_rng(rng))
+    children = parents.genes[pairs[:, 1]].copy()
+
+    for i in range(num_offspring):
+        a, b = start[i], stop[i]
+        y1 = parents.genes[pairs[i, 0], :, 1]
+        y2 = parents.genes[pairs[i, 1], :, 1]
+        child = children[i, :, 1]
+        child[a:b] = y1[a:b]
+        # position of every value in the second parent
+        where_in_y2 = np.empty(parents.table_size, dtype=np.int64)
+        where_in_y2[y2] = np.arange(len(y2))
+        in_segment = np.zeros(parents.table_size, dtype=bool)
+        in_segment[y1[a:b]] = True
+        for j in range(a, b):
+            value = y2[j]
+            if in_segment[value]:
+                continue
+            position = j
+            while a <= position < b:
+                position = where_in_y2[y1[position]]
+            child[position] = value
+
+    return Population(children, parents.table_size, parents.piece)
+
+
+# Swaps the y of two random genes in every child genes times, keeps the y values a permutation
+def swap_mutate(children, mutate_chance, per_child=False, rng=None, genes=1):
+    rng = make_rng(rng)
+    rows = np.nonzero(mutation_mask(len(children), mutate_chance, per_child, rng))[0]
+    y = children.genes[:, :, 1]
+    for _ in range(genes):
+        first = rng.integers(0, children.chromosome_size, size=len(rows))
+        second = rng.integers(0, children.chromosome_size, size=len(rows))
+        y[rows, first], y[rows, second] = y[rows, second], y[rows, first]
+    children.fitness = None
+    return children
+
+
+# Which children mutate, either all of them on one roll like mutate always did or each on its own roll
+def mutation_mask(size, mutate_chance, per_child, rng):
+    if per_child:
+        return rng.random(size) <= mutate_chance
+    return np.full(size, rng.random() <= mutate_chance)
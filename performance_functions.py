@@ -1,244 +1,241 @@
-from ga import *
+from constants import *
+from config import GAConfig
+from ga import solve, create_population
+from other_tools import make_ordinal
+from rng import make_rng
+import numpy as np
+import csv
+import json
+import os
+import subprocess
+import sys
 import time
-import matplotlib.pyplot as plt
 
+"""
+Headless benchmark suite. Every sweep runs the GA num_iterations times per value of one hyper
+parameter, the others stay at their constants.py value, and records
+
+    wall_time             average seconds per run
+    generations           average generations per run
+    success_rate          share of runs that found a perfect state
+    evaluations_per_sec   individuals scored per second
+
+Results are written to CSV and JSON in out_dir so runs can be compared across commits, plots are
+only rendered to files and only when asked for.
+"""
+
+# Values every sweep goes through
+SWEEPS = {
+    'table_size': [5, 10, 15, 20],
+    'pop_size': [50, 100, 150, 200],
+    'num_parents': [2, 3, 4, 5, 6, 7],
+    'mutate_chance': [0.25, 0.45, 0.65, 0.85, 0.95],
+    'init_size': [100, 1000, 2500, 5000, 10000],
+    'piece': [QUEEN, BISHOP, ROOK, KNIGHT],
+}
+
+# Axis labels for the plots
+LABELS = {
+    'table_size': 'Table Size',
+    'pop_size': 'Population Size',
+    'num_parents': 'Number of Parents',
+    'mutate_chance': 'Mutation Probability',
+    'init_size': 'Initial Population',
+    'piece': 'Piece',
+}
+
+FIELDS = ['parameter', 'value', 'runs', 'wall_time', 'generations', 'success_rate', 'evaluations_per_sec']
 
-# Takes the average over N runs as the table size increases and plots the results
-def table_size_performance(num_iterations):
-    table_size_variations = [5, 10, 15, 20]
-    curr_time = [0] * len(table_size_variations)
-    avg_time = []
 
-    # Run that values n times and take an average for better estimation
-    for n in range(num_iterations):
-        print(make_ordinal(n + 1) + ' Table Size Run... ')
-        for i in range(len(table_size_variations)):
-            tic = time.perf_counter()
-            genetic_algorithm_performance_eval(table_size_variations[i], POP_SIZE, NUM_PARENTS, MUTATE_CHANCE,
-                                               INIT_SIZE)
-            toc = time.perf_counter()
-            curr_time[i] += (toc - tic)
-    print('Table Size Testing Done. ')
-    print()
-
-    # Take average
-    for time_ in curr_time:
-        avg_time.append(time_ / num_iterations)
-
-    # plot
-    plt.plot(table_size_variations, avg_time)
-    plt.xlabel('Table Size')
-    plt.ylabel('Time (Seconds)')
-
-    # displaying the title
-    plt.title("Table Size vs Time (Seconds)")
-
-    # show the graph
-    plt.show()
-
-    plt.clf()
-    plt.cla()
-    plt.close()
-
-
-# Takes the average over N runs as the population size increases and plots the results
-def pop_size_performance(num_iterations):
-    pop_size_variations = [50, 100, 150, 200]
-    curr_time = [0] * len(pop_size_variations)
-    avg_time = []
-
-    # Run that values n times and take an average for better estimation
-    for n in range(num_iterations):
-        print(make_ordinal(n + 1) + ' Population Size Run... ')
-        for i in range(len(pop_size_variations)):
-            tic = time.perf_counter()
-            genetic_algorithm_performance_eval(TABLE_SIZE, pop_size_variations[i], NUM_PARENTS, MUTATE_CHANCE,
-                                               INIT_SIZE)
-            toc = time.perf_counter()
-            curr_time[i] += (toc - tic)
-    print('Population Size Testing Done. ')
-    print()
-
-    # Take average
-    for time_ in curr_time:
-        avg_time.append(time_ / num_iterations)
-
-    # plot
-    plt.plot(pop_size_variations, avg_time)
-    plt.xlabel('Population Size')
-    plt.ylabel('Time (Seconds)')
-
-    # displaying the title
-    plt.title("Population Size vs Time (Seconds)")
-
-    # show the graph
-    plt.show()
-
-    plt.clf()
-    plt.cla()
-    plt.close()
-
-
-# Takes the average over N runs as the parent size increases and plots the results
-def parent_size_performance(num_iterations):
-    parent_size_variations = [2, 3, 4, 5, 6, 7]
-    curr_time = [0] * len(parent_size_variations)
-    avg_time = []
-
-    # Run that values n times and take an average for better estimation
-    for n in range(num_iterations):
-        print(make_ordinal(n + 1) + ' Number of Parents Run... ')
-        for i in range(len(parent_size_variations)):
-            tic = time.perf_counter()
-            genetic_algorithm_performance_eval(TABLE_SIZE, POP_SIZE, parent_size_variations[i], MUTATE_CHANCE,
-                                               INIT_SIZE)
-            toc = time.perf_counter()
-            curr_time[i] += (toc - tic)
-    print('Number of Parents Testing Done. ')
-    print()
-
-    # Take average
-    for time_ in curr_time:
-        avg_time.append(time_ / num_iterations)
-
-    # plot
-    plt.plot(parent_size_variations, avg_time)
-    plt.xlabel('Number of Parents')
-    plt.ylabel('Time (Seconds)')
-
-    # displaying the title
-    plt.title("Number of Parents vs Time (Seconds)")
-
-    # show the graph
-    plt.show()
-
-    plt.clf()
-    plt.cla()
-    plt.close()
-
-
-# Takes the average over N runs as the mutation probability increases and plots the results
-def mutation_prob_performance(num_iterations):
-    mutation_prob_variations = [0.25, 0.45, 0.65, 0.85, 0.95]
-    curr_time = [0] * len(mutation_prob_variations)
-    avg_time = []
+# This function is used for the performance evaluation, removed the printing so it doesn't clutter the screen
+# returns the best result, the number of generations, whether it was solved and how many individuals were scored
+def genetic_algorithm_performance_eval(table_size, pop_size, num_parents, mutate_prob, init_pop, piece,
+                                       num_generations=NUM_GENERATIONS, rng=None):
+    config = GAConfig(table_size=table_size, piece=piece, pop_size=pop_size, init_size=init_pop,
+                      num_parents=num_parents, num_generations=num_generations, mutate_chance=mutate_prob,
+                      seed=make_rng(rng), verbose=False, strategy='ga')
+    result = solve(config)
+    return {'best_result': result.best_result, 'generations': result.generations,
+            'solved': result.solved, 'evaluations': result.evaluations}
+
+
+# Takes the average over N runs as one hyper parameter changes, returns one row per value
+def sweep(parameter, num_iterations, values=None, num_generations=NUM_GENERATIONS, seed=None):
+    if values is None and parameter not in SWEEPS:
+        raise ValueError("parameter must be one of " + str(list(SWEEPS)))
+    values = SWEEPS[parameter] if values is None else values
+    rng = make_rng(seed)
+    totals = [{'wall_time': 0.0, 'generations': 0, 'solved': 0, 'evaluations': 0} for _ in values]
 
     # Run that values n times and take an average for better estimation
     for n in range(num_iterations):
-        print(make_ordinal(n + 1) + ' Mutation Probability Run... ')
-        for i in range(len(mutation_prob_variations)):
+        print(make_ordinal(n + 1) + ' ' + LABELS[parameter] + ' Run... ')
+        for i, value in enumerate(values):
+            settings = {'table_size': TABLE_SIZE, 'pop_size': POP_SIZE, 'num_parents': NUM_PARENTS,
+                        'mutate_chance': MUTATE_CHANCE, 'init_size': INIT_SIZE, 'piece': PIECE}
+            settings[parameter] = value
             tic = time.perf_counter()
-            genetic_algorithm_performance_eval(TABLE_SIZE, POP_SIZE, NUM_PARENTS, mutation_prob_variations[i],
-                                               INIT_SIZE)
+            result = genetic_algorithm_performance_eval(settings['table_size'], settings['pop_size'],
+                                                        settings['num_parents'], settings['mutate_chance'],
+                                                        settings['init_size'], settings['piece'],
+                                                        num_generations, rng)
             toc = time.perf_counter()
-            curr_time[i] += (toc - tic)
-
-    print('Mutation Probability Testing Done. ')
+            totals[i]['wall_time'] += toc - tic
+            totals[i]['generations'] += result['generations']
+            totals[i]['solved'] += result['solved']
+            totals[i]['evaluations'] += result['evaluations']
+    print(LABELS[parameter] + ' Testing Done. ')
     print()
 
     # Take average
-    for time_ in curr_time:
-        avg_time.append(time_ / num_iterations)
-
-    # plot
-    plt.plot(mutation_prob_variations, avg_time)
-    plt.xlabel('Mutation Probability')
+    rows = []
+    for value, total in zip(values, totals):
+        rows.append({'parameter': parameter, 'value': value, 'runs': num_iterations,
+                     'wall_time': total['wall_time'] / num_iterations,
+                     'generations': total['generations'] / num_iterations,
+                     'success_rate': total['solved'] / num_iterations,
+                     'evaluations_per_sec': total['evaluations'] / total['wall_time'] if total['wall_time'] else 0.0})
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, path):
+    with open(path, 'w') as file:
+        json.dump(rows, file, indent=2)
+
+
+# Renders the time of one sweep to an image file, matplotlib is only loaded here
+def plot_sweep(rows, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    parameter = rows[0]['parameter']
+    plt.plot([str(row['value']) if parameter == 'piece' else row['value'] for row in rows],
+             [row['wall_time'] for row in rows])
+    plt.xlabel(LABELS[parameter])
     plt.ylabel('Time (Seconds)')
-
-    # displaying the title
-    plt.title("Mutation Probability vs Time (Seconds)")
-
-    # show the graph
-    plt.show()
+    plt.title(LABELS[parameter] + " vs Time (Seconds)")
+    plt.savefig(path)
 
     plt.clf()
     plt.cla()
     plt.close()
 
 
-# Takes the average over N runs as the mutation probability increases and plots the results
-def init_pop_performance(num_iterations, variations=[100, 1000, 2500, 5000, 10000]):
-    init_pop_variations = variations
-    curr_time = [0] * len(init_pop_variations)
-    avg_time = []
-
-    # Run that values n times and take an average for better estimation
-    for n in range(num_iterations):
-        print(make_ordinal(n + 1) + ' Initial Population Run... ')
-        for i in range(len(init_pop_variations)):
-            tic = time.perf_counter()
-            genetic_algorithm_performance_eval(TABLE_SIZE, POP_SIZE, NUM_PARENTS, MUTATE_CHANCE, init_pop_variations[i])
-            toc = time.perf_counter()
-            curr_time[i] += (toc - tic)
-
-    print('Initial Population Testing Done. ')
-    print()
-
-    # Take average
-    for time_ in curr_time:
-        avg_time.append(time_ / num_iterations)
-
-    # plot
-    plt.plot(init_pop_variations, avg_time)
-    plt.xlabel('Initial Population')
-    plt.ylabel('Time (Seconds)')
+# Runs a sweep and writes <out_dir>/<parameter>.csv, .json and optionally .png
+def run_sweep(parameter, num_iterations, out_dir='benchmarks', plot=False, **kwargs):
+    rows = sweep(parameter, num_iterations, **kwargs)
+    os.makedirs(out_dir, exist_ok=True)
+    write_csv(rows, os.path.join(out_dir, parameter + '.csv'))
+    write_json(rows, os.path.join(out_dir, parameter + '.json'))
+    if plot:
+        plot_sweep(rows, os.path.join(out_dir, parameter + '.png'))
+    return rows
 
-    # displaying the title
-    plt.title("Initial Population vs Time (Seconds)")
 
-    # show the graph
-    plt.show()
+def table_size_performance(num_iterations, **kwargs):
+    return run_sweep('table_size', num_iterations, **kwargs)
 
-    plt.clf()
-    plt.cla()
-    plt.close()
-
-
-# This function is used for the performance evaluation, removed the printing so it doesn't clutter the screen
-def genetic_algorithm_performance_eval(table_size, pop_size, num_parents, mutate_prob, init_pop, piece):
-    new_population = create_population(init_pop, table_size, piece)
 
-    best_result = -1
-    best_state = []
+def pop_size_performance(num_iterations, **kwargs):
+    return run_sweep('pop_size', num_iterations, **kwargs)
 
-    for generation in range(NUM_GENERATIONS):
 
-        # Find the fitness for each chromosome in the population
-        fitness = cal_pop_fitness(new_population, table_size)
+def parent_size_performance(num_iterations, **kwargs):
+    return run_sweep('num_parents', num_iterations, **kwargs)
 
-        # Select the best parents in the population for mating
-        parents = select_best(new_population, fitness, num_parents)
 
-        # Generate the crossover
-        offspring = cross_over(parents, pop_size)
+def mutation_prob_performance(num_iterations, **kwargs):
+    return run_sweep('mutate_chance', num_iterations, **kwargs)
 
-        # Adding variation using random mutation
-        offspring_mutation = mutate(offspring, mutate_prob, piece)
 
-        # The best result in the current population
-        curr_state = select_best(new_population, fitness)
-        curr_result = count_safe_pieces(curr_state[0], table_size, piece)
-        if best_result < curr_result:
-            best_result = curr_result
-            best_state = curr_state[0]
+def init_pop_performance(num_iterations, **kwargs):
+    return run_sweep('init_size', num_iterations, **kwargs)
 
-        # exit loop if best result is equal to size of board
-        if best_result == table_size:
-            break
 
-        # Creating new population based on a random number of surviving parents and their offspring
-        number_surviving = np.random.randint(1, len(parents))
-        parents_fitness = cal_pop_fitness(parents, table_size)
-        best_parents = select_best(parents, parents_fitness, number_surviving)
-        new_population[0:] = best_parents
-        new_population += offspring_mutation
+def piece_performance(num_iterations, **kwargs):
+    return run_sweep('piece', num_iterations, **kwargs)
 
 
 # Takes as input the number of times to run the program to get a average run time, the higher the more accurate
-# but also the more time it take to run
-def performance_evaluation(num_iterations):
-    # table_size_performance(num_iterations)
-    # pop_size_performance(num_iterations)
-    # parent_size_performance(num_iterations)
-    mutation_prob_performance(num_iterations)
-    # init_pop_performance(num_iterations)
+# but also the more time it take to run. Runs every sweep in parameters, all of them by default
+def performance_evaluation(num_iterations, parameters=None, **kwargs):
+    results = {}
+    for parameter in (parameters or list(SWEEPS)):
+        results[parameter] = run_sweep(parameter, num_iterations, **kwargs)
+    return results
+
+
+# Times the compiled nqueens kernel against the NumPy batch fitness for every piece and table size,
+# the rows are written to <out_dir>/kernel.csv and .json
+def kernel_performance(table_sizes=(8, 20, 50, 100), pop_size=200, repeats=3, out_dir='benchmarks', seed=None):
+    import fitness
+    if fitness.nqueens is None:
+        print("The nqueens extension isn't built, run: python setup.py build_ext --inplace")
+        return []
+
+    rng = make_rng(seed)
+    rows = []
+    for piece in [QUEEN, BISHOP, ROOK, KNIGHT]:
+        for table_size in table_sizes:
+            population = create_population(pop_size, chromosome_max(table_size, piece), table_size, piece, rng)
+            genes = population.genes.astype(np.int64)
+            timings = {}
+            for name, evaluate in [('numpy', fitness.numpy_batch_fitness), ('compiled', fitness.batch_fitness)]:
+                tic = time.perf_counter()
+                for _ in range(repeats):
+                    evaluate(genes, table_size, piece)
+                timings[name] = (time.perf_counter() - tic) / repeats
+            speedup = timings['numpy'] / timings['compiled'] if timings['compiled'] else float('inf')
+            rows.append({'piece': piece, 'table_size': table_size, 'numpy_time': timings['numpy'],
+                         'compiled_time': timings['compiled'], 'speedup': speedup})
+            print(piece + ' ' + str(table_size) + 'x' + str(table_size) + ' speedup ' + str(round(speedup, 2)) + 'x')
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'kernel.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    write_json(rows, os.path.join(out_dir, 'kernel.json'))
+    return rows
+
+
+# Seconds a fresh interpreter may spend on top of a bare 'python -c pass' for every start up,
+# the solve path imports the GA and numpy, the CLI itself must not import anything heavy
+IMPORT_BUDGETS = {'cli': 0.05, 'ga': 0.25, 'batch': 0.3}
+IMPORT_COMMANDS = {'cli': [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'N-Queens.py'), '--help'],
+                   'ga': ['-c', 'import ga'],
+                   'batch': ['-c', 'import batch']}
+
+
+# Best of repeats wall time of a fresh interpreter running args
+def _startup_time(args, repeats):
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = float('inf')
+    for _ in range(repeats):
+        tic = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=here, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - tic)
+    return best
+
+
+# Times every start up in IMPORT_COMMANDS against its budget, pygame, matplotlib and the
+# worker pools must stay out of all of them
+def import_time_benchmark(budgets=None, repeats=5):
+    budgets = budgets if budgets is not None else IMPORT_BUDGETS
+    baseline = _startup_time(['-c', 'pass'], repeats)
+    rows = []
+    for name, budget in budgets.items():
+        seconds = max(0.0, _startup_time(IMPORT_COMMANDS[name], repeats) - baseline)
+        rows.append({'name': name, 'seconds': seconds, 'budget': budget, 'within_budget': seconds <= budget})
+        print(name + ' ' + str(round(seconds * 1000, 1)) + 'ms (budget ' + str(round(budget * 1000)) + 'ms) '
+              + ('ok' if seconds <= budget else 'OVER BUDGET'))
+    return rows
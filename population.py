@@ -0,0 +1,102 @@
+import numpy as np
+from fitness import batch_fitness
+
+"""
+Compact population, every individual lives in one contiguous pop x chromosome x 2 integer array
+instead of a list of [x, y] lists.
+
+Indexing an individual gives a view into the array, anything that makes new individuals (take,
+concat, copy) copies the genes so children never share memory with their parents.
+
+The fitness vector goes along with the genes, rows that were never scored hold UNSCORED.
+evaluate only scores those rows, so the parents kept from the last generation are not scored
+again.
+"""
+
+# Fitness of an individual that still has to be scored
+UNSCORED = -1
+
+
+# Smallest integer type that can hold a board coordinate
+def gene_dtype(table_size):
+    return np.int16 if table_size <= np.iinfo(np.int16).max else np.int32
+
+
+class Population:
+    def __init__(self, genes, table_size, piece, fitness=None):
+        self.table_size = table_size
+        self.piece = piece
+        self.genes = np.ascontiguousarray(genes, dtype=gene_dtype(table_size))
+        self.fitness = fitness
+
+    # Population from a list of [x, y] states
+    @classmethod
+    def from_states(cls, states, table_size, piece):
+        genes = np.asarray(states, dtype=gene_dtype(table_size)).reshape(len(states), -1, 2)
+        return cls(genes, table_size, piece)
+
+    @property
+    def size(self):
+        return self.genes.shape[0]
+
+    @property
+    def chromosome_size(self):
+        return self.genes.shape[1]
+
+    def __len__(self):
+        return self.genes.shape[0]
+
+    # View of one individual, a chromosome x 2 array
+    def __getitem__(self, index):
+        return self.genes[index]
+
+    def __iter__(self):
+        return iter(self.genes)
+
+    # Scores the individuals without a fitness and keeps the fitness vector on the population,
+    # evaluator is any of the evaluators in evaluators.py
+    def evaluate(self, evaluator=None):
+        if self.fitness is None:
+            rows = None
+        else:
+            rows = np.flatnonzero(self.fitness == UNSCORED)
+            if len(rows) == 0:
+                return self.fitness
+        genes = self.genes if rows is None else self.genes[rows]
+        if evaluator is None:
+            scores = batch_fitness(genes, self.table_size, self.piece)
+        else:
+            scores = evaluator.evaluate(genes, self.table_size, self.piece)
+        scores = np.asarray(scores, dtype=np.int64)
+        if rows is None:
+            self.fitness = scores
+        else:
+            self.fitness[rows] = scores
+        return self.fitness
+
+    # Fitness vector with UNSCORED for every row when nothing was scored yet
+    def known_fitness(self):
+        if self.fitness is None:
+            return np.full(len(self), UNSCORED, dtype=np.int64)
+        return self.fitness
+
+    # New population holding copies of the individuals at indices
+    def take(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        fitness = None if self.fitness is None else self.fitness[indices]
+        return Population(self.genes[indices], self.table_size, self.piece, fitness)
+
+    # New population made of self followed by other
+    def concat(self, other):
+        fitness = None
+        if self.fitness is not None or other.fitness is not None:
+            fitness = np.concatenate([self.known_fitness(), other.known_fitness()])
+        return Population(np.concatenate([self.genes, other.genes]), self.table_size, self.piece, fitness)
+
+    def copy(self):
+        fitness = None if self.fitness is None else self.fitness.copy()
+        return Population(self.genes.copy(), self.table_size, self.piece, fitness)
+
+    # Population back as a list of [x, y] states
+    def tolist(self):
+        return self.genes.tolist()
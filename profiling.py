@@ -0,0 +1,102 @@
+import json
+import time
+import numpy as np
+from convergence import diversity
+
+"""
+Instrumentation of the generation loop. solve charges the time of every stage to a
+GenerationProfiler and hands one record per generation to the hooks, a hook is any callable
+taking the record
+
+    generation      1 based generation number
+    stages          seconds spent in every stage of STAGES in this generation
+    evaluations     individuals scored so far
+    best            best fitness found so far
+    best_state      the individual holding it, not a copy, hooks that keep it have to copy it
+    mean            mean fitness of the scored population
+    min             lowest fitness of the scored population
+    diversity       share of distinct individuals in the scored population
+    mutate_chance   mutation chance used for the offspring
+    elapsed         seconds since the profiler was made
+
+The mean and the diversity are only computed when there are hooks, the stage totals always
+end up in SolveResult.timings['stages']. TraceRecorder is the hook behind --profile, it keeps
+the records without the best state, prints a summary table and writes the JSON trace.
+"""
+
+STAGES = ['fitness', 'selection', 'repair', 'crossover', 'mutation', 'replace']
+
+
+class GenerationProfiler:
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks or [])
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.record = None
+        self.created = self.last = time.perf_counter()
+
+    # Starts the clock of the next stage
+    def start(self):
+        self.last = time.perf_counter()
+
+    # Charges the time since the last start or lap to stage
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] += now - self.last
+        self.last = now
+
+    # Population statistics of the generation, skipped when nobody listens
+    def observe(self, generation, fitness, population, evaluations, best_result, best_state, mutate_chance):
+        if not self.hooks:
+            return
+        self.record = {'generation': generation + 1, 'evaluations': evaluations, 'best': best_result,
+                       'best_state': best_state,
+                       'mean': float(np.mean(fitness)), 'min': int(np.min(fitness)),
+                       'diversity': diversity(population), 'mutate_chance': mutate_chance,
+                       'elapsed': time.perf_counter() - self.created}
+
+    # Closes the generation, adds its stage times to the totals and calls the hooks
+    def end_generation(self):
+        for stage, seconds in self.stages.items():
+            self.totals[stage] += seconds
+        if self.record is not None:
+            self.record['stages'] = self.stages
+            for hook in self.hooks:
+                hook(self.record)
+            self.record = None
+        self.stages = dict.fromkeys(STAGES, 0.0)
+
+
+class TraceRecorder:
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append({key: value for key, value in record.items() if key != 'best_state'})
+
+    # One row per stage with the total seconds, the seconds per generation and the share of the total
+    def summary(self):
+        generations = max(1, len(self.records))
+        totals = dict.fromkeys(STAGES, 0.0)
+        for record in self.records:
+            for stage, seconds in record['stages'].items():
+                totals[stage] += seconds
+        total = sum(totals.values()) or 1.0
+        return [{'stage': stage, 'total': seconds, 'per_generation': seconds / generations,
+                 'share': seconds / total} for stage, seconds in totals.items()]
+
+    # file is stdout when None
+    def print_summary(self, file=None):
+        print('{:<10} {:>10} {:>14} {:>7}'.format('stage', 'total (s)', 'per gen (ms)', 'share'), file=file)
+        for row in self.summary():
+            print('{:<10} {:>10.4f} {:>14.4f} {:>6.1f}%'.format(row['stage'], row['total'],
+                                                               row['per_generation'] * 1000, row['share'] * 100),
+                  file=file)
+        if self.records:
+            last = self.records[-1]
+            print(str(last['generation']) + ' generations, ' + str(last['evaluations']) + ' evaluations, best '
+                  + str(last['best']), file=file)
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'generations': self.records}, file, indent=1)
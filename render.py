@@ -0,0 +1,136 @@
+import os
+from constants import *
+from chess import set_state
+
+"""
+Board rendering. The piece images are loaded once and scaled once per square size, the squares
+of a board are drawn once into a background surface, a frame is that background with the pieces
+blitted on top.
+
+headless() switches SDL to the dummy video driver, everything but show works without a display
+and writes PNGs: save for one state, save_sequence for a sampled run of best states, see
+BestStateSampler. show opens a window and only redraws when pygame asks for it.
+"""
+
+# Side of the rendered board in pixels
+BOARD_PIXELS = 768
+# Where genetic_algorithm writes the board of the best state
+BOARD_IMAGE = 'board.png'
+COLORS = [(240, 217, 181), (181, 136, 99)]
+IMAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_images = {}
+_sprites = {}
+_backgrounds = {}
+
+
+# Use the dummy video driver, call before pygame opens a display
+def headless():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+
+def _pygame():
+    import pygame
+    return pygame
+
+
+# Piece images scaled to square_size, loaded and scaled once
+def sprites(square_size):
+    if square_size not in _sprites:
+        p = _pygame()
+        if not _images:
+            for piece in [QUEEN, BISHOP, KNIGHT, ROOK]:
+                _images[piece] = p.image.load(os.path.join(IMAGE_DIR, piece + '.png'))
+        _sprites[square_size] = {piece: p.transform.scale(image, (square_size, square_size))
+                                 for piece, image in _images.items()}
+    return _sprites[square_size]
+
+
+# Empty board of table_size squares, drawn once per (table_size, pixels)
+def background(table_size, pixels=BOARD_PIXELS):
+    key = (table_size, pixels)
+    if key not in _backgrounds:
+        p = _pygame()
+        square_size = pixels // table_size
+        surface = p.Surface((square_size * table_size, square_size * table_size))
+        for r in range(table_size):
+            for c in range(table_size):
+                color = COLORS[(r + c) % 2]
+                surface.fill(color, p.Rect(c * square_size, r * square_size, square_size, square_size))
+        _backgrounds[key] = surface
+    return _backgrounds[key]
+
+
+class BoardRenderer:
+    def __init__(self, table_size, piece, pixels=BOARD_PIXELS):
+        self.table_size = table_size
+        self.piece = piece
+        self.pixels = pixels
+        self.square_size = pixels // table_size
+
+    # Surface with the state drawn on the cached background, pieces at -1 are left out
+    def render(self, state):
+        p = _pygame()
+        surface = background(self.table_size, self.pixels).copy()
+        sprite = sprites(self.square_size)[self.piece]
+        board = set_state(state, self.piece, self.table_size)
+        for r in range(self.table_size):
+            for c in range(self.table_size):
+                if board[c][r] != '--':
+                    surface.blit(sprite, p.Rect(c * self.square_size, r * self.square_size,
+                                                self.square_size, self.square_size))
+        return surface
+
+    # Writes the state to a PNG, returns the path
+    def save(self, state, path):
+        _pygame().image.save(self.render(state), path)
+        return path
+
+    # Writes every state to <out_dir>/<prefix>_0000.png, ..., returns the paths
+    def save_sequence(self, states, out_dir, prefix='best'):
+        os.makedirs(out_dir, exist_ok=True)
+        return [self.save(state, os.path.join(out_dir, prefix + '_' + str(i).zfill(4) + '.png'))
+                for i, state in enumerate(states)]
+
+    # Shows the state in a window until it is closed
+    def show(self, state):
+        p = _pygame()
+        p.init()
+        screen = p.display.set_mode((self.pixels, self.pixels))
+        screen.fill(p.Color("white"))
+        screen.blit(self.render(state), (0, 0))
+        p.display.flip()
+        # nothing changes on the board, only redraw when the window asks for it
+        while True:
+            e = p.event.wait()
+            if e.type == p.QUIT:
+                break
+            if e.type == p.VIDEOEXPOSE:
+                p.display.flip()
+        p.display.quit()
+
+
+# solve hook that keeps a copy of the best state whenever it improves, at most every
+# 'every' generations, for BoardRenderer.save_sequence
+class BestStateSampler:
+    def __init__(self, every=1):
+        self.every = every
+        self.best = None
+        self.states = []
+        self.generations = []
+
+    def __call__(self, record):
+        if record['generation'] % self.every and self.states:
+            return
+        if self.best is not None and record['best'] <= self.best:
+            return
+        self.best = record['best']
+        state = record['best_state']
+        state = state.state if hasattr(state, 'state') else state
+        self.states.append([list(map(int, xy_pos)) for xy_pos in state])
+        self.generations.append(record['generation'])
+
+
+# Writes the board of the state to path, nothing is shown
+def save_board(state, config, path=BOARD_IMAGE):
+    return BoardRenderer(config.table_size, config.piece).save(state, path)
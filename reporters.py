@@ -0,0 +1,160 @@
+from queue import SimpleQueue
+import json
+import os
+import sys
+import threading
+import time
+from other_tools import make_ordinal
+
+"""
+Progress reporters for the generation loop. solve calls report(generation, best_result) every
+generation and finish(...) once at the end, a reporter decides what gets written.
+
+    silent   nothing
+    print    the '<n>th Generation best result is ...' line
+    jsonl    one JSON object per line {"generation", "best", "elapsed"}
+
+report is rate limited, only every 'every'-th generation and at most one line per 'interval'
+seconds of wall clock get through, the check costs a modulo and a clock read. The final line
+is always written. ThreadedReporter moves the formatting and writing to a background thread so
+the loop only pays for a queue put.
+
+The jsonl reporter of a resumed run gets the generation of the checkpoint as resume_generation,
+its file keeps the lines up to it, without the final line of the earlier run, and is appended to.
+"""
+
+
+class Reporter:
+    def __init__(self, every=1, interval=0.0):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.every = every
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = None
+
+    # Called every generation, generation is 0 based
+    def report(self, generation, best_result):
+        if (generation + 1) % self.every:
+            return
+        if self.interval > 0:
+            now = time.perf_counter()
+            if self.last is not None and now - self.last < self.interval:
+                return
+            self.last = now
+        self.emit(generation + 1, best_result, time.perf_counter() - self.start)
+
+    # Called once when the run stops, always writes the last generation
+    def finish(self, generation, best_result, stop_reason=None):
+        self.emit(generation + 1, best_result, time.perf_counter() - self.start, stop_reason)
+        self.close()
+
+    def emit(self, generation, best_result, elapsed, stop_reason=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SilentReporter(Reporter):
+    def report(self, generation, best_result):
+        pass
+
+    def finish(self, generation, best_result, stop_reason=None):
+        pass
+
+    def emit(self, generation, best_result, elapsed, stop_reason=None):
+        pass
+
+
+class PrintReporter(Reporter):
+    def __init__(self, every=1, interval=0.0, stream=None):
+        super().__init__(every, interval)
+        self.stream = stream if stream is not None else sys.stdout
+        self.generation = None
+
+    def emit(self, generation, best_result, elapsed, stop_reason=None):
+        # the final line repeats the last reported generation otherwise
+        if stop_reason is not None and generation == self.generation:
+            return
+        self.generation = generation
+        self.stream.write(make_ordinal(generation) + ' Generation best result is ' + str(best_result) + '\n')
+
+
+# Keeps the lines of a jsonl report up to generation, the final line and a cut off line go too
+def _cut(path, generation):
+    with open(path) as file:
+        lines = file.readlines()
+    with open(path, 'w') as file:
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record['generation'] <= generation and 'stop_reason' not in record:
+                file.write(line.rstrip('\n') + '\n')
+
+
+class JsonLinesReporter(Reporter):
+    def __init__(self, every=1, interval=0.0, path=None, resume_generation=None):
+        super().__init__(every, interval)
+        self.stream = sys.stdout
+        if path is not None:
+            if resume_generation is not None and os.path.exists(path):
+                _cut(path, resume_generation)
+                self.stream = open(path, 'a')
+            else:
+                self.stream = open(path, 'w')
+        self.owned = path is not None
+
+    def emit(self, generation, best_result, elapsed, stop_reason=None):
+        record = {'generation': generation, 'best': best_result, 'elapsed': elapsed}
+        if stop_reason is not None:
+            record['stop_reason'] = stop_reason
+        self.stream.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.stream.flush()
+        if self.owned:
+            self.stream.close()
+
+
+# Wraps a reporter, its rate limit is checked in the loop and emit runs on a background thread
+class ThreadedReporter(Reporter):
+    def __init__(self, reporter):
+        super().__init__(reporter.every, reporter.interval)
+        self.reporter = reporter
+        self.queue = SimpleQueue()
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def emit(self, *line):
+        self.queue.put(line)
+
+    def _drain(self):
+        while True:
+            line = self.queue.get()
+            if line is None:
+                return
+            self.reporter.emit(*line)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.reporter.close()
+
+
+REPORTERS = {'silent': SilentReporter, 'print': PrintReporter, 'jsonl': JsonLinesReporter}
+
+
+# Builds a reporter by name, path is only used by jsonl (stdout when None)
+def get_reporter(name='print', every=1, interval=0.0, path=None, threaded=False, resume_generation=None):
+    if name not in REPORTERS:
+        raise ValueError("reporter must be one of " + str(list(REPORTERS)))
+    if name == 'jsonl':
+        reporter = JsonLinesReporter(every, interval, path, resume_generation)
+    else:
+        reporter = REPORTERS[name](every, interval)
+    if threaded and name != 'silent':
+        reporter = ThreadedReporter(reporter)
+    return reporter
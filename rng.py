@@ -0,0 +1,28 @@
+import numpy as np
+
+"""
+Random number streams. Every GA entry point takes one seed or numpy Generator and passes the
+Generator down, so a run is fully defined by its seed. Parallel workers get independent
+streams spawned from the same SeedSequence, never seed + i.
+"""
+
+
+# Generator from a seed, a SeedSequence or an existing Generator, None gives a fresh unseeded one
+def make_rng(seed=None):
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+# n independent child SeedSequences, a Generator spawns from its own seed sequence
+def spawn_seeds(seed, n):
+    if isinstance(seed, np.random.Generator):
+        seed = seed.bit_generator.seed_seq
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+
+# n independent Generators for parallel workers
+def spawn_rngs(seed, n):
+    return [np.random.default_rng(child) for child in spawn_seeds(seed, n)]
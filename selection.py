@@ -0,0 +1,64 @@
+import numpy as np
+from rng import make_rng
+
+"""
+Selection strategies, each one returns the indices of the selected parents together with the
+index of the best individual of the population.
+
+    best        top k by fitness in one O(n) argpartition, ties go to the lower index
+    tournament  k tournaments of tournament_size random individuals, the fittest of each wins
+    roulette    k draws with a chance proportional to the fitness
+"""
+
+STRATEGIES = ['best', 'tournament', 'roulette']
+
+
+# Unique sort key, higher fitness first and the lower index first among equal fitness
+def _ranking_key(fitness):
+    n = len(fitness)
+    return fitness * n + (n - 1 - np.arange(n))
+
+
+# Indices of the k fittest individuals best first, and the index of the best one
+def top_k(fitness, k):
+    fitness = np.asarray(fitness, dtype=np.int64)
+    key = _ranking_key(fitness)
+    k = min(k, len(fitness))
+    if k < len(fitness):
+        candidates = np.argpartition(-key, k - 1)[:k]
+    else:
+        candidates = np.arange(len(fitness))
+    indices = candidates[np.argsort(-key[candidates])]
+    return indices, int(indices[0])
+
+
+# Winners of k tournaments between tournament_size random individuals
+def tournament(fitness, k, tournament_size=3, rng=None):
+    fitness = np.asarray(fitness, dtype=np.int64)
+    key = _ranking_key(fitness)
+    entrants = make_rng(rng).integers(0, len(fitness), size=(k, tournament_size))
+    winners = entrants[np.arange(k), np.argmax(key[entrants], axis=1)]
+    return winners, int(np.argmax(key))
+
+
+# k individuals drawn with a chance proportional to their fitness
+def roulette(fitness, k, rng=None):
+    fitness = np.asarray(fitness, dtype=np.float64)
+    cumulative = np.cumsum(fitness)
+    if cumulative[-1] <= 0:
+        # nobody scored, every individual gets the same chance
+        cumulative = np.arange(1, len(fitness) + 1, dtype=np.float64)
+    draws = make_rng(rng).random(k) * cumulative[-1]
+    winners = np.searchsorted(cumulative, draws, side='right')
+    return np.minimum(winners, len(fitness) - 1), int(np.argmax(_ranking_key(fitness.astype(np.int64))))
+
+
+# Selects k parents with the given strategy, returns their indices and the index of the best individual
+def select(fitness, k, strategy='best', tournament_size=3, rng=None):
+    if strategy == 'best':
+        return top_k(fitness, k)
+    if strategy == 'tournament':
+        return tournament(fitness, k, tournament_size, rng)
+    if strategy == 'roulette':
+        return roulette(fitness, k, rng)
+    raise ValueError("strategy must be one of " + str(STRATEGIES))
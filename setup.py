@@ -1,6 +1,7 @@
 from setuptools import setup
 from Cython.Build import cythonize
 
+# python setup.py build_ext --inplace
 setup(
     ext_modules = cythonize("nqueens.pyx")
-)
\ No newline at end of file
+)
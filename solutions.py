@@ -0,0 +1,144 @@
+import json
+import os
+import time
+import numpy as np
+from constants import *
+from chess import count_safe_pieces
+from config import GAConfig
+from fitness_cache import symmetries
+from ga import solve
+
+"""
+Solution enumeration. solve stops at the first perfect state, enumerate_solutions keeps
+restarting it with fresh seeds and collects the distinct solutions of a board.
+
+A perfect state has no attacked piece whatever the chromosome order, so a solution is the set
+of its squares. It is keyed on its canonical form, the smallest sorted square list among its
+images under the board symmetries
+
+    rooks, bishops, knights   all 8 rotations and reflections
+    queens                    all 8 when no two queens share a row, a classic N-Queens solution,
+                              otherwise the 4 that keep the columns, piece_logic doesn't check
+                              queens on rows so the other 4 images are not solutions
+
+Every solution is checked with count_safe_pieces before it goes in the set, new ones are
+appended to a JSON lines file straight away with the table_size and piece they solve. Solutions
+of the same board already in the file are loaded first, so a later call keeps adding to the same
+set, lines of other boards are left alone.
+"""
+
+
+# Canonical key of a perfect state, the smallest sorted square list of its images as bytes
+def canonical_key(state, table_size, piece):
+    state = np.asarray(state, dtype=np.int64).reshape(-1, 2)
+    images = symmetries(piece)
+    if piece == QUEEN and len(np.unique(state[:, 0])) == len(state):
+        images = symmetries(ROOK)
+    m = table_size - 1
+    keys = []
+    for image in images:
+        x, y = image(state[:, 0], state[:, 1], m)
+        keys.append(np.sort(x * table_size + y).astype(np.int32).tobytes())
+    return min(keys)
+
+
+# Square list of a canonical key
+def key_squares(key):
+    return np.frombuffer(key, dtype=np.int32).tolist()
+
+
+# Solutions already written to path
+def load_solutions(path):
+    if not os.path.exists(path):
+        return
+    with open(path) as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # a line cut off by a crash
+                continue
+
+
+class SolutionSet:
+    def __init__(self, table_size, piece):
+        self.table_size = table_size
+        self.piece = piece
+        self.target = chromosome_max(table_size, piece)
+        self.keys = set()
+        self.rejected = 0
+
+    # Adds a state, returns its canonical key when it is a new solution, None otherwise
+    def add(self, state):
+        if len(state) != self.target or count_safe_pieces(state, self.table_size, self.piece) != self.target:
+            self.rejected += 1
+            return None
+        key = canonical_key(state, self.table_size, self.piece)
+        if key in self.keys:
+            return None
+        self.keys.add(key)
+        return key
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, state):
+        return canonical_key(state, self.table_size, self.piece) in self.keys
+
+
+# Runs solve with a new seed until max_solutions distinct solutions, max_runs runs or time_budget
+# seconds, whichever comes first, new solutions are streamed to out_path when given
+def enumerate_solutions(config=None, max_solutions=None, max_runs=None, time_budget=None, out_path=None,
+                        seed=None, verbose=True):
+    config = config if config is not None else GAConfig()
+    if max_solutions is None and max_runs is None and time_budget is None:
+        raise ValueError("one of max_solutions, max_runs or time_budget must be set")
+    solutions = SolutionSet(config.table_size, config.piece)
+    if out_path is not None:
+        for record in load_solutions(out_path):
+            if record.get('table_size') != config.table_size or record.get('piece') != config.piece:
+                continue
+            solutions.keys.add(np.asarray(record['canonical'], dtype=np.int32).tobytes())
+    loaded = len(solutions)
+    run_config = config.replace(strategy='ga', verbose=False, checkpoint_path=None, trace_path=None)
+
+    # every run gets its own stream spawned from seed, the same seed repeats the same runs
+    seeds = np.random.SeedSequence(seed)
+    tic = time.perf_counter()
+    runs = solved = 0
+    out = open(out_path, 'a') if out_path is not None else None
+    try:
+        while True:
+            elapsed = time.perf_counter() - tic
+            if max_solutions is not None and len(solutions) - loaded >= max_solutions:
+                break
+            if max_runs is not None and runs >= max_runs:
+                break
+            if time_budget is not None and elapsed >= time_budget:
+                break
+            result = solve(run_config.replace(seed=seeds.spawn(1)[0]))
+            runs += 1
+            if not result.solved:
+                continue
+            solved += 1
+            key = solutions.add(result.best_state)
+            if key is None:
+                continue
+            if out is not None:
+                out.write(json.dumps({'table_size': config.table_size, 'piece': config.piece,
+                                      'state': sorted(result.best_state), 'canonical': key_squares(key), 'run': runs,
+                                      'generations': result.generations,
+                                      'elapsed': time.perf_counter() - tic}) + '\n')
+                out.flush()
+            if verbose:
+                print(str(len(solutions) - loaded) + ' unique solutions after ' + str(runs) + ' runs')
+    finally:
+        if out is not None:
+            out.close()
+
+    elapsed = time.perf_counter() - tic
+    found = len(solutions) - loaded
+    return {'unique': found, 'total_unique': len(solutions), 'runs': runs, 'solved': solved,
+            'duplicates': solved - found - solutions.rejected, 'rejected': solutions.rejected,
+            'wall_time': elapsed, 'unique_per_sec': found / elapsed if elapsed > 0 else 0.0,
+            'solutions': solutions}
@@ -0,0 +1,164 @@
+import gzip
+import json
+import os
+import numpy as np
+
+"""
+Generation traces for offline analysis. TraceWriter is a solve hook (see profiling.py) that
+streams one record per generation to disk, buffered and written in bulk.
+
+    .jsonl       one JSON object per line with every field of TRACE_FIELDS and best_delta, the
+                 genes of the best state that changed since the last record as [index, x, y]
+    .trace       columnar, fixed size binary records of TRACE_DTYPE back to back, no delta, can
+                 be read with np.fromfile or np.memmap
+    + .gz        either one gzip compressed
+
+A resumed run passes the generation of its checkpoint as resume_generation, the records after it
+are cut from the trace and the new ones appended, so the trace covers the whole run once.
+
+iter_trace reads a trace back one record at a time, load_trace as one NumPy array per field and
+iter_curves one field of many traces run after run, so thousands of runs never have to be in
+memory together.
+"""
+
+TRACE_FIELDS = ['generation', 'evaluations', 'best', 'mean', 'min', 'diversity', 'elapsed']
+TRACE_DTYPE = np.dtype([('generation', '<i8'), ('evaluations', '<i8'), ('best', '<i8'), ('mean', '<f8'),
+                        ('min', '<i8'), ('diversity', '<f8'), ('elapsed', '<f8')])
+# Records kept in memory before a bulk write
+BUFFER_SIZE = 256
+# Records read at once from a columnar trace
+READ_CHUNK = 4096
+
+
+def _is_columnar(path):
+    return path.endswith('.trace') or path.endswith('.trace.gz')
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+# Keeps the records of a trace up to generation, a record cut off by a crash goes too
+def _cut(path, generation):
+    # compressed like path, _open goes by the file name
+    temp = path + '.tmp'
+    with _open(path, 'rb') as source, (gzip.open(temp, 'wb') if path.endswith('.gz') else open(temp, 'wb')) as target:
+        if _is_columnar(path):
+            while True:
+                chunk = source.read(READ_CHUNK * TRACE_DTYPE.itemsize)
+                chunk = chunk[:len(chunk) - len(chunk) % TRACE_DTYPE.itemsize]
+                if not chunk:
+                    break
+                records = np.frombuffer(chunk, dtype=TRACE_DTYPE)
+                target.write(records[records['generation'] <= generation].tobytes())
+        else:
+            for line in source:
+                try:
+                    keep = json.loads(line)['generation'] <= generation
+                except ValueError:
+                    continue
+                if keep:
+                    target.write(line.rstrip(b'\n') + b'\n')
+    os.replace(temp, path)
+
+
+class TraceWriter:
+    def __init__(self, path, buffer_size=BUFFER_SIZE, resume_generation=None):
+        if not (_is_columnar(path) or path.endswith('.jsonl') or path.endswith('.jsonl.gz')):
+            raise ValueError("trace path must end in .jsonl, .trace or either one + .gz")
+        self.path = path
+        self.columnar = _is_columnar(path)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.previous = None
+        if resume_generation is not None and os.path.exists(path):
+            _cut(path, resume_generation)
+            self.file = _open(path, 'ab')
+        else:
+            self.file = _open(path, 'wb')
+
+    def __call__(self, record):
+        if self.columnar:
+            self.buffer.append(tuple(record[field] for field in TRACE_FIELDS))
+        else:
+            row = {field: record[field] for field in TRACE_FIELDS}
+            row['best_delta'] = self._delta(record['best_state'])
+            self.buffer.append(json.dumps(row))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Genes of the best state that changed since the last record, all of them the first time
+    def _delta(self, state):
+        state = state.state if hasattr(state, 'state') else state
+        state = np.asarray(state, dtype=np.int64).reshape(-1, 2)
+        if self.previous is None or self.previous.shape != state.shape:
+            changed = np.arange(len(state))
+        else:
+            changed = np.flatnonzero((self.previous != state).any(axis=1))
+        self.previous = state.copy()
+        return np.column_stack([changed, state[changed]]).tolist()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.columnar:
+            self.file.write(np.array(self.buffer, dtype=TRACE_DTYPE).tobytes())
+        else:
+            self.file.write(('\n'.join(self.buffer) + '\n').encode())
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Records of a trace one at a time as dicts
+def iter_trace(path):
+    with _open(path, 'rb') as file:
+        if not _is_columnar(path):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        while True:
+            chunk = file.read(READ_CHUNK * TRACE_DTYPE.itemsize)
+            if not chunk:
+                return
+            for row in np.frombuffer(chunk, dtype=TRACE_DTYPE).tolist():
+                yield dict(zip(TRACE_FIELDS, row))
+
+
+# One array per field, all of TRACE_FIELDS by default. An uncompressed columnar trace is memory
+# mapped, nothing is read until the arrays are used
+def load_trace(path, fields=None):
+    fields = fields or TRACE_FIELDS
+    if path.endswith('.trace'):
+        # np.memmap can't map an empty file, a run stopped before its first flush leaves one
+        if os.path.getsize(path) == 0:
+            records = np.zeros(0, dtype=TRACE_DTYPE)
+        else:
+            records = np.memmap(path, dtype=TRACE_DTYPE, mode='r')
+        return {field: records[field] for field in fields}
+    if _is_columnar(path):
+        with _open(path, 'rb') as file:
+            records = np.frombuffer(file.read(), dtype=TRACE_DTYPE)
+        return {field: records[field] for field in fields}
+    columns = {field: [] for field in fields}
+    for record in iter_trace(path):
+        for field in fields:
+            columns[field].append(record[field])
+    return {field: np.asarray(values) for field, values in columns.items()}
+
+
+# (path, array) for one field of every trace, loaded one trace at a time
+def iter_curves(paths, field='best'):
+    for path in paths:
+        yield path, load_trace(path, [field])[field]